@@ -1,9 +1,30 @@
-import streamlit as st
-import faiss
+import os
+import html
 import json
-import openai
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import telemetry  # first: starts the cold-start clock (see telemetry.milestone)
+import streamlit as st
 import numpy as np
-import os
+
+import attributes
+import autocomplete
+import generation
+import index_release
+import passages
+import precompute
+import personalization
+import rag_context
+import retrieval
+import similar_items
+from faiss_index import EMBEDDING_MODEL, FAISS_INDEX_FILE, METADATA_FILE, get_client
+from prompt_feeder import get_prompts_by_category
+from query_router import QueryRouter
+
+# faiss and openai are imported lazily (in the loader thread and in get_client):
+# together they cost about a second before anything could be drawn.
 
 # ──────────────────────────────────────────────
 # 🔧 Page setup
@@ -15,6 +36,7 @@ st.set_page_config(
 )
 st.title("ShopLyst — Smart Product Finder")
 st.markdown("Find products based on **meaning**, not just keywords.")
+telemetry.milestone("startup_first_render")
 
 # ──────────────────────────────────────────────
 # 🔐 API & Data Setup
@@ -25,17 +47,145 @@ def load_api_key():
     if not api_key:
         st.error("No OpenAI API key found. Please set OPENAI_API_KEY in environment variables.")
         st.stop()
-    openai.api_key = api_key
+
+
+# Set to expose Prometheus metrics at http://localhost:<port>/metrics
+METRICS_PORT = os.getenv("METRICS_PORT")
+
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_server(port: int):
+    """Start the /metrics endpoint once per process (Streamlit reruns the script per interaction)."""
+    return telemetry.serve_metrics(port)
+
+
+@st.cache_resource(show_spinner=False)
+def warm_up_openai():
+    """Once per process, in the background: open the OpenAI connection (TLS handshake
+    included) and load the tokenizer, so the first search doesn't pay for either."""
+    def warm():
+        with telemetry.span("warmup_openai"):
+            try:
+                get_client().models.retrieve(EMBEDDING_MODEL)
+            except Exception as e:
+                print(f"⚠️ OpenAI warm-up failed: {e}")
+        with telemetry.span("warmup_tokenizer"):
+            rag_context.count_tokens("warm-up")
+
+    thread = threading.Thread(target=warm, name="openai-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def _read_data(version, directory, completer):
+    """Read index, metadata, numeric attributes and passages of one release (runs in the loader thread).
+
+    The files are checked against the release manifest (sizes, checksums, counts,
+    dimension, embedding model) before anything is served. The query router is
+    rebuilt with them and only adopts precomputed results built for this exact
+    version, so cached rankings never outlive their index; the same goes for the
+    similar-items graph. Its product titles go into the search-box ``completer``
+    once the release checks out. Ends with a dummy search so FAISS's first real
+    one doesn't pay for page faults and thread-pool start-up.
+    """
+    import faiss
+
+    telemetry.cache_miss("index_data")
+    with telemetry.span("validate_release"):
+        manifest = index_release.validate(directory)
+    with telemetry.span("load_index"):
+        index = faiss.read_index(os.path.join(directory, FAISS_INDEX_FILE))
+        with open(os.path.join(directory, METADATA_FILE), "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+    with telemetry.span("load_attributes"):
+        attrs = attributes.load_attributes(os.path.join(directory, attributes.ATTRIBUTES_FILE), metadata)
+    with telemetry.span("build_router"):
+        router = QueryRouter(get_prompts_by_category())
+        router.set_shards(metadata)
+        router.load_precomputed(precompute.load_store(precompute.PRECOMPUTED_FILE, version))
+        router.load_prompt_vectors(*precompute.load_prompt_embeddings())
+    with telemetry.span("load_similar_items"):
+        similar = similar_items.load_similar(similar_items.SIMILAR_FILE, version)
+    with telemetry.span("load_passages"):
+        passage_index = passages.load_passages(directory)
+    index_release.check_loaded(manifest, index, metadata, passage_index)
+    with telemetry.span("build_autocomplete"):
+        completer.set_titles(metadata, version)
+    with telemetry.span("warmup_faiss"):
+        if index.ntotal:
+            index.search(np.zeros((1, index.d), dtype="float32"), 1)
+    return index, metadata, attrs, router, similar, passage_index
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _start_loading(version, directory, precomputed_stamp, similar_stamp, _completer):
+    """Start reading this release in a background thread, once per release; returns its Future."""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-loader")
+    future = executor.submit(_read_data, version, directory, _completer)
+    executor.shutdown(wait=False)
+    return future
+
+
+@st.cache_resource(show_spinner=False)
+def _ready_data():
+    """Process-wide holder for the last fully loaded data, served while a newer version loads."""
+    return {}
+
+
+@st.cache_resource(show_spinner=False)
+def get_completer() -> autocomplete.Completer:
+    """One per process: completions learn from every session's searches and survive index reloads."""
+    return autocomplete.Completer(get_prompts_by_category())
+
+
+# Loose-file layout only: how long to wait for the second rename of an old-style save
+MISMATCH_RETRY_WAIT = 0.5
+
+
+def _data_key():
+    """Cache key of what's live: release (or loose-file version), directory and the cache files' mtimes."""
+    # Builds publish (or roll back to) a release by swapping one pointer; its name keys the cache
+    version, directory = index_release.locate()
+    # A fresh precompute run is picked up too, without waiting for a new index
+    precomputed_stamp = os.path.getmtime(precompute.PRECOMPUTED_FILE) if os.path.exists(precompute.PRECOMPUTED_FILE) else None
+    similar_stamp = os.path.getmtime(similar_items.SIMILAR_FILE) if os.path.exists(similar_items.SIMILAR_FILE) else None
+    return version, directory, precomputed_stamp, similar_stamp
 
 
 def load_data():
-    """Load FAISS index and product metadata."""
+    """Load FAISS index, product metadata, attributes, router, similar-items graph and passages, hot-reloading on change.
+
+    Loading happens off the script thread. On a cold start the page waits under a
+    spinner (the title is already on screen); when a new release goes live the
+    previous one keeps answering until the new one is ready, or for good if the new
+    one fails validation.
+    """
+    ready = _ready_data()
     try:
-        index = faiss.read_index("product_faiss.index")
-        with open("product_metadata.json", "r", encoding="utf-8") as f:
-            metadata = json.load(f)
-        return index, metadata
+        telemetry.cache_lookup("index_data")
+        key = _data_key()
+        future = _start_loading(*key, get_completer())
+        if not future.done() and "data" in ready:
+            return ready["data"]
+        with st.spinner("📦 Loading product index..."):
+            # A failed load stays cached for its key: a bad release isn't re-read every rerun
+            data = future.result()
+            if data[0].ntotal != len(data[1]):
+                # Loose-file layout only: caught between the two renames of an old-style save.
+                # Re-reading the same version would mismatch again; wait for the second rename.
+                time.sleep(MISMATCH_RETRY_WAIT)
+                retry_key = _data_key()
+                if retry_key == key:
+                    raise ValueError(f"index holds {data[0].ntotal} vectors but metadata {len(data[1])} products")
+                data = _start_loading(*retry_key, get_completer()).result()
+                if data[0].ntotal != len(data[1]):
+                    raise ValueError(f"index holds {data[0].ntotal} vectors but metadata {len(data[1])} products")
+        ready["data"] = data
+        return data
     except Exception as e:
+        if "data" in ready:
+            st.warning(f"⚠️ New index release rejected, still serving the previous one: {e}")
+            return ready["data"]
         st.error(f"❌ Failed to load FAISS index or metadata: {e}")
         st.stop()
 
@@ -44,71 +194,111 @@ def load_data():
 # 🧠 Core Functions
 # ──────────────────────────────────────────────
 @st.cache_resource(show_spinner=False)
-def embed_query(query: str):
-    """Generate embedding for a given query."""
-    response = openai.embeddings.create(
-        model="text-embedding-3-small",
-        input=query
-    )
+def _embed_query(query: str):
+    telemetry.cache_miss("embed_query")
+    with telemetry.span("embedding_api"):
+        response = get_client().embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=query
+        )
     return np.array(response.data[0].embedding, dtype="float32")
 
-def search_products(query: str, index, metadata, top_k):
-    """Search top-k similar products using FAISS."""
-    query_vector = embed_query(query)
+
+def embed_query(query: str):
+    """Generate embedding for a given query (cached per query string)."""
+    telemetry.cache_lookup("embed_query")
+    with telemetry.span("embed_query"):
+        return _embed_query(query)
+
+def get_profile() -> personalization.SessionProfile:
+    """This session's preference profile (created on first use)."""
+    if "profile" not in st.session_state:
+        st.session_state["profile"] = personalization.SessionProfile()
+    return st.session_state["profile"]
+
+
+def like_product(index, product_id: int):
+    """Button callback: fold a liked product's stored vector into the session profile."""
+    get_profile().add_click(retrieval.candidate_vectors(index, [product_id])[0])
+
+
+def search_products(query: str, index, metadata, top_k, allowed_ids=None, router=None, categories=None,
+                    profile=None, passage_index=None):
+    """Search top-k similar products using FAISS, optionally only among ``allowed_ids``.
+
+    With a router, known prompts are answered from their cached ranking and other
+    queries are limited to the predicted category shard; ``categories`` (the user's
+    explicit selection) overrides the prediction. A session ``profile`` re-ranks the
+    over-fetched candidates, so once it has a direction cached rankings are skipped;
+    until then they are served as they are and the prompt's stored embedding still
+    feeds the profile. A release built with passages searches those and ranks
+    products by their best passage.
+    """
+    with telemetry.span("route"):
+        route = router.route(query) if router else None
+    unfiltered = allowed_ids is None and not categories
+    profile_vector = profile.vector() if profile else None
+    if route and route.kind == "known" and unfiltered and profile_vector is None:
+        telemetry.cache_lookup("precomputed_results")
+        if route.cached_ids is not None and len(route.cached_ids) >= top_k:
+            with telemetry.span("metadata_lookup"):
+                results = [dict(metadata[i], id=i) for i in route.cached_ids[:top_k] if i < len(metadata)]
+            prompt_vector = router.prompt_vector(query)
+            if profile is not None and prompt_vector is not None and prompt_vector.shape[0] == index.d:
+                profile.add_query(prompt_vector)
+            return results
+        telemetry.cache_miss("precomputed_results")
+
+    scope = None
+    if categories and router:
+        scope = np.concatenate([router.shards.get(c, np.empty(0, dtype="int64")) for c in categories])
+    elif route:
+        scope = router.shard_ids(route.category)
+    if scope is not None:
+        allowed_ids = scope if allowed_ids is None else np.intersect1d(allowed_ids, scope)
+
+    stored = router.prompt_vector(query) if router else None
+    query_vector = stored if stored is not None and stored.shape[0] == index.d else embed_query(query)
 
     # Ensure the query embedding and FAISS index match in dimension
     if query_vector.shape[0] != index.d:
         st.error(f"Embedding dimension mismatch: query({query_vector.shape[0]}) vs index({index.d})")
         st.stop()
 
-    # Perform FAISS similarity search
-    D, I = index.search(np.array([query_vector]), top_k)
-
-    # Collect matching product metadata
-    results = [metadata[i] for i in I[0] if i < len(metadata)]
+    # Over-fetch from FAISS, then personalize and diversify (MMR + per-domain cap)
+    results = retrieval.search(index, metadata, query_vector, top_k, allowed_ids=allowed_ids,
+                               profile_vector=profile_vector, passages=passage_index)
+    if profile is not None:
+        profile.add_query(query_vector)
+    if route and route.kind == "known" and unfiltered and profile_vector is None:
+        router.remember(query, [r["id"] for r in results])
     return results
 
 
 
-def generate_response_with_rag(query: str, docs: list):
-    """Generate a single overall recommendation (not per item)."""
-    context = "\n\n".join(
-        f"Title: {item['title']}\n"
-        f"Price: {item.get('price', 'Not available')}\n"
-        f"Rating: {item.get('rating', 'Not available')}\n"
-        f"Summary: {item.get('summary', 'No summary provided')}\n"
-        f"URL: {item['url']}"
-        for item in docs
-    )
-
-    prompt = f"""
-You are ShopLyst, an AI-powered shopping assistant.
+@st.cache_resource(show_spinner=False)
+def get_generator() -> generation.Generator:
+    """One per process, so the hedge delay learns from every session's latencies."""
+    return generation.Generator()
 
-The user searched for: '{query}'.
 
-Below are some related product listings. Your job:
-- Analyze them collectively.
-- Identify **the single most suitable option or combination** for the user.
-- Give a clear, concise recommendation — 3 to 5 sentences max.
-- Maintain a confident, helpful tone (like a top-tier shopping guide).
-- If any product lacks price or rating, naturally phrase around it (e.g., "well-reviewed" or "affordable option").
-- End your message with a small call-to-action like “You might want to start here.”
+def generate_response_with_rag(query: str, docs: list, token_budget: int = rag_context.CONTEXT_TOKEN_BUDGET):
+    """Generate a single overall recommendation (not per item).
 
-PRODUCT DATA:
-{context}
+    Returns (text, stats); stats carries prompt token counts, latency, and which
+    attempt answered (``source``: primary / hedge / fallback). Past the deadline
+    the answer is a template summary of the retrieved products.
+    """
+    with telemetry.span("build_prompt"):
+        prompt, stats = rag_context.build_rag_prompt(query, docs, token_budget)
 
-Return only the final recommendation text (no bullets, no headings).
-"""
-
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"⚠️ AI reasoning failed: {e}"
+    with telemetry.span("llm_call"):
+        text, info = get_generator().generate(prompt, query, docs)
+    if info["errors"]:
+        print(f"⚠️ AI reasoning failed: {'; '.join(info['errors'])}")
+    stats.update(latency_ms=info["latency_ms"], source=info["source"], attempts=info["attempts"],
+                 errors=info["errors"])
+    return text, stats
 
 
 
@@ -123,6 +313,9 @@ def render_sidebar(metadata, index):
         st.session_state["history"] = []
 
     top_k = st.sidebar.slider("Number of results", 3, 10, 5)
+    token_budget = st.sidebar.slider(
+        "AI context budget (tokens)", 300, 4000, rag_context.CONTEXT_TOKEN_BUDGET, step=100
+    )
 
     # Category filter
     if metadata and "category" in metadata[0]:
@@ -131,9 +324,20 @@ def render_sidebar(metadata, index):
     else:
         selected_categories = []
 
+    # Price / rating filters (0 = no limit); "under $X" in the query also sets one
+    max_price = st.sidebar.number_input("Max price ($)", min_value=0, value=0, step=50)
+    min_rating = st.sidebar.slider("Min rating", 0.0, 5.0, 0.0, step=0.5)
+    filters = {
+        "price_max": float(max_price) if max_price else None,
+        "rating_min": min_rating if min_rating else None,
+    }
+
     # Reload index
     if st.sidebar.button("Reload Index", use_container_width=True):
-        index, metadata = load_data()
+        _start_loading.clear()
+        _ready_data().clear()
+        st.session_state.pop("last_results", None)  # ids may not match the reloaded index
+        index, metadata, *_ = load_data()
         st.sidebar.success("Index reloaded!")
 
     # Recent searches
@@ -141,26 +345,75 @@ def render_sidebar(metadata, index):
     for q in st.session_state["history"][-5:][::-1]:
         st.sidebar.markdown(f"🔹 {q}")
 
-    return top_k, selected_categories
+    # Session personalization
+    profile = get_profile()
+    if profile.vector() is not None:
+        st.sidebar.caption(f"🎯 Personalized from {profile.queries} searches and {profile.clicks} likes")
+        if st.sidebar.button("Reset personalization", use_container_width=True):
+            profile.reset()
+
+    st.sidebar.checkbox("🐞 Show timing debug panel", key="debug_panel")
+
+    return top_k, selected_categories, token_budget, filters
+
+
+def resolve_filters(query: str, filters: dict) -> dict:
+    """Merge sidebar filters with price bounds parsed from the query (sidebar wins)."""
+    merged = {"price_min": None, "price_max": None, "rating_min": None}
+    merged.update(attributes.parse_query_constraints(query))
+    merged.update({k: v for k, v in filters.items() if v is not None})
+    return merged
 
 
-def render_search_ui(index, metadata, top_k, selected_categories):
+def pick_completion(text: str):
+    """Suggestion clicked: make it the query and search right away (before the rerun draws the input)."""
+    st.session_state["query"] = text
+    st.session_state["search_now"] = True
+
+
+def render_completions(query: str):
+    """Suggestion buttons for the box's text (the input reruns on Enter or blur, not per keystroke); ⚡ marks catalog prompts."""
+    with telemetry.span("autocomplete"):
+        suggestions = get_completer().complete(query)
+    for text, known in suggestions:
+        st.button(f"{'⚡' if known else '↳'} {text}", key=f"complete_{text}", on_click=pick_completion, args=(text,))
+
+
+def render_search_ui(index, metadata, attrs, router, top_k, selected_categories, filters, passage_index=None):
     """Render main search and results layout."""
     col1, col2 = st.columns([1, 3])
 
     with col1:
         st.header("🔍 Search")
-        query = st.text_input("Describe what you want:", "mirrorless camera with 4K and flip screen")
-
-        if st.button("🔍 Search", use_container_width=True):
-            st.session_state["history"].append(query)
+        st.session_state.setdefault("query", "mirrorless camera with 4K and flip screen")
+        query = st.text_input("Describe what you want:", key="query")
+
+        picked = st.session_state.pop("search_now", False)
+        if not (st.button("🔍 Search", use_container_width=True) or picked):
+            render_completions(query)
+        else:
+            history = st.session_state["history"]
+            history.append(query)
+            del history[:-personalization.HISTORY_LIMIT]
+            get_completer().record(query)
+
+            active = resolve_filters(query, filters)
+            allowed_ids = attributes.filter_ids(attrs, **active)
+            if allowed_ids is not None:
+                bounds = [f"{name.replace('_', ' ')} {value:g}" for name, value in active.items() if value is not None]
+                st.caption(f"Filtering: {', '.join(bounds)} ({len(allowed_ids)} products match)")
+
+            route = router.route(query)
+            served_cached = allowed_ids is None and not selected_categories and get_profile().vector() is None
+            if route.cached_ids is not None and served_cached:
+                st.caption("⚡ Known search — served from cache")
+            elif route.category and not selected_categories and router.shard_ids(route.category) is not None:
+                st.caption(f"🧭 Searching in {route.category.replace('_', ' ')} ({route.confidence:.0%} sure)")
 
             with st.spinner("✨ Searching for the best matches..."):
-                top_results = search_products(query, index, metadata, top_k=top_k)
-
-                # Apply category filter
-                if selected_categories:
-                    top_results = [r for r in top_results if r.get("category") in selected_categories]
+                top_results = search_products(query, index, metadata, top_k=top_k, allowed_ids=allowed_ids,
+                                              router=router, categories=selected_categories,
+                                              profile=get_profile(), passage_index=passage_index)
 
                 if not top_results:
                     st.warning("No results found.")
@@ -171,7 +424,20 @@ def render_search_ui(index, metadata, top_k, selected_categories):
 
     return None, None
 
-def render_results(top_results, query):
+def similar_links(item, metadata, similar, n=3) -> str:
+    """HTML links to a product's precomputed nearest neighbours (a row lookup, no search)."""
+    if similar is None or "id" not in item:
+        return ""
+    links = [f"<a href='{html.escape(metadata[i]['url'], quote=True)}' target='_blank'>"
+             f"{html.escape(metadata[i]['title'][:60])}</a>"
+             for i, _ in similar_items.similar_to(similar, item["id"], n) if i < len(metadata)]
+    if not links:
+        return ""
+    return f"<p style='margin:6px 0 0; font-size:0.9em;'><b>Similar:</b> {' · '.join(links)}</p>"
+
+
+def render_results(top_results, query, token_budget=rag_context.CONTEXT_TOKEN_BUDGET, router=None,
+                   metadata=None, similar=None, index=None):
     """Display product results and ShopLyst's overall AI suggestion."""
     if not top_results:
         return
@@ -179,24 +445,42 @@ def render_results(top_results, query):
     st.header("🛍️ Results")
 
     # Product cards
-    for item in top_results:
-        price = item.get("price", "Not available")
-        rating = item.get("rating", "Not available")
-
-        st.markdown(f"""
-        <div style='padding:15px; border-radius:10px; background:#f8f9fa; margin-bottom:12px; box-shadow:0 1px 3px rgba(0,0,0,0.1);'>
-            <h4 style='margin-bottom:4px;'>{item['title']}</h4>
-            <p style='margin:0;'><b>Price:</b> {price}</p>
-            <p style='margin:0;'><b>Rating:</b> {rating}</p>
-            <a href='{item['url']}' target='_blank'>🔗 View Product</a>
-        </div>
-        """, unsafe_allow_html=True)
+    with telemetry.span("render_results"):
+        for item in top_results:
+            price = item.get("price", "Not available")
+            rating = item.get("rating", "Not available")
+
+            st.markdown(f"""
+            <div style='padding:15px; border-radius:10px; background:#f8f9fa; margin-bottom:12px; box-shadow:0 1px 3px rgba(0,0,0,0.1);'>
+                <h4 style='margin-bottom:4px;'>{item['title']}</h4>
+                <p style='margin:0;'><b>Price:</b> {price}</p>
+                <p style='margin:0;'><b>Rating:</b> {rating}</p>
+                <a href='{item['url']}' target='_blank'>🔗 View Product</a>
+                {similar_links(item, metadata, similar) if metadata else ""}
+            </div>
+            """, unsafe_allow_html=True)
+            if index is not None and "id" in item:
+                st.button("👍 More like this", key=f"like_{item['id']}", on_click=like_product,
+                          args=(index, item["id"]))
 
     # 🧠 Highlighted AI Suggestion Section
     st.markdown("### 💡 ShopLyst Smart Suggestion")
 
     with st.spinner("🧠 Analyzing results to find the best overall match..."):
-        rag_response = generate_response_with_rag(query, top_results)
+        answer_key = (query, tuple(r.get("id") for r in top_results), token_budget)
+        last = st.session_state.get("last_answer")
+        cached = router.cached_answer(query, [r["id"] for r in top_results]) if router else None
+        telemetry.cache_lookup("precomputed_answer")
+        if not cached:
+            telemetry.cache_miss("precomputed_answer")
+        if cached:
+            rag_response, rag_stats = cached, None
+        elif last and last[0] == answer_key:
+            # Same results re-shown after a rerun (e.g. a like); keep the answer we already have
+            rag_response, rag_stats = last[1], last[2]
+        else:
+            rag_response, rag_stats = generate_response_with_rag(query, top_results, token_budget)
+            st.session_state["last_answer"] = (answer_key, rag_response, rag_stats)
 
     st.markdown(f"""
     <div style='
@@ -213,7 +497,45 @@ def render_results(top_results, query):
     {rag_response}
     </div>
     """, unsafe_allow_html=True)
+    if rag_stats is None:
+        st.caption("⚡ Precomputed answer")
+    elif rag_stats["source"] == "fallback" and rag_stats.get("errors"):
+        st.caption(f"⚠️ Quick summary: the AI answer failed ({rag_stats['errors'][-1]})")
+    elif rag_stats["source"] == "fallback":
+        st.caption(f"⏱️ Quick summary: the AI answer missed its {generation.DEADLINE_SECONDS:g}s deadline")
+    else:
+        st.caption(
+            f"Prompt: {rag_stats['prompt_tokens']} tokens "
+            f"({rag_stats['context_tokens']}/{rag_stats['budget']} context, "
+            f"{rag_stats['docs_used']}/{rag_stats['docs_given']} products) · "
+            f"answered in {rag_stats['latency_ms']:.0f} ms"
+            + (" (hedged request)" if rag_stats["source"] == "hedge" else "")
+        )
+
+
+
+def render_debug_panel():
+    """Stage timings of the last search, cumulative span stats and cache hit ratios."""
+    with st.sidebar.expander("🐞 Debug timings", expanded=True):
+        last = st.session_state.get("last_trace")
+        if last:
+            st.markdown("**Last search**")
+            st.table([{"stage": name, "ms": round(ms, 2)} for name, ms in last])
+
+        st.markdown("**Cache hit ratios**")
+        for cache, c in telemetry.REGISTRY.hit_ratios().items():
+            ratio = "–" if c["ratio"] is None else f"{c['ratio']:.0%}"
+            st.markdown(f"`{cache}` {ratio} ({c['hits']} hits / {c['misses']} misses)")
+
+        startup = telemetry.milestones()
+        if startup:
+            st.markdown("**Cold start**")
+            st.table([{"milestone": name.replace("startup_", ""), "s": round(sec, 2)} for name, sec in startup.items()])
 
+        st.markdown("**All stages (this process)**")
+        st.dataframe(telemetry.REGISTRY.summary(), use_container_width=True, hide_index=True)
+        st.download_button("⬇️ Prometheus metrics", telemetry.REGISTRY.prometheus_text(),
+                           file_name="shoplyst_metrics.prom", mime="text/plain")
 
 
 # ──────────────────────────────────────────────
@@ -221,11 +543,31 @@ def render_results(top_results, query):
 # ──────────────────────────────────────────────
 def main():
     load_api_key()
-    index, metadata = load_data()
-    top_k, selected_categories = render_sidebar(metadata, index)
-    top_results, query = render_search_ui(index, metadata, top_k, selected_categories)
-    if top_results:
-        render_results(top_results, query)
+    warm_up_openai()
+    if METRICS_PORT:
+        start_metrics_server(int(METRICS_PORT))
+    index, metadata, attrs, router, similar, passage_index = load_data()
+    top_k, selected_categories, token_budget, filters = render_sidebar(metadata, index)
+    start = time.perf_counter()
+    with telemetry.trace() as spans:
+        top_results, query = render_search_ui(index, metadata, attrs, router, top_k, selected_categories, filters,
+                                              passage_index)
+        if query is not None:
+            st.session_state["last_results"] = (top_results, query) if top_results else None
+        if top_results:
+            render_results(top_results, query, token_budget, router, metadata, similar, index)
+            telemetry.milestone("startup_first_result")
+    if query is None and st.session_state.get("last_results"):
+        # Keep the last results on screen across other interactions (likes, sidebar changes)
+        shown, shown_query = st.session_state["last_results"]
+        render_results(shown, shown_query, token_budget, router, metadata, similar, index)
+    if query is not None:
+        # Only reruns that actually searched count as requests
+        seconds = time.perf_counter() - start
+        telemetry.record("request", seconds)
+        st.session_state["last_trace"] = spans + [("request", seconds * 1000)]
+    if st.session_state.get("debug_panel"):
+        render_debug_panel()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,108 @@
+import re
+from typing import List, Optional
+
+import numpy as np
+
+# Numeric columns stored next to the FAISS index, row i = product id i
+ATTRIBUTES_FILE = "product_attributes.npz"
+
+# The crawler's price regex also picks up stray "$1"/"$0" tokens; treat those as missing
+MIN_PRICE = 2.0
+MAX_PRICE = 100_000.0
+
+_PRICE_RE = re.compile(r"(\d[\d,]*(?:\.\d+)?)")
+_AMOUNT = r"\$\s?(\d[\d,]*(?:\.\d+)?)\s*(k\b)?"
+_BETWEEN_RE = re.compile(rf"(?:between\s+)?{_AMOUNT}\s*(?:-|–|to|and)\s*{_AMOUNT}", re.IGNORECASE)
+_UPPER_RE = re.compile(rf"\b(?:under|below|less than|cheaper than|up to|max(?:imum)?)\s*{_AMOUNT}", re.IGNORECASE)
+_LOWER_RE = re.compile(rf"\b(?:over|above|more than|at least|min(?:imum)?)\s*{_AMOUNT}", re.IGNORECASE)
+
+
+def parse_price(value) -> float:
+    """'$1,299.99' → 1299.99; missing or implausible prices → NaN."""
+    if value is None:
+        return np.nan
+    if isinstance(value, (int, float)):
+        price = float(value)
+    else:
+        match = _PRICE_RE.search(str(value))
+        if not match:
+            return np.nan
+        price = float(match.group(1).replace(",", ""))
+    return price if MIN_PRICE <= price <= MAX_PRICE else np.nan
+
+
+def parse_rating(value) -> float:
+    """'4.5' → 4.5 on a 0–5 scale; missing, zero or out-of-range ratings → NaN."""
+    try:
+        rating = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return rating if 0.0 < rating <= 5.0 else np.nan
+
+
+def build_attributes(metadata: List[dict]) -> dict:
+    """Typed columns aligned with FAISS ids."""
+    return {
+        "price": np.array([parse_price(m.get("price")) for m in metadata], dtype="float32"),
+        "rating": np.array([parse_rating(m.get("rating")) for m in metadata], dtype="float32"),
+    }
+
+
+def save_attributes(attributes: dict, path: str = ATTRIBUTES_FILE):
+    with open(path, "wb") as f:
+        np.savez(f, **attributes)
+
+
+def load_attributes(path: str = ATTRIBUTES_FILE, metadata: Optional[List[dict]] = None) -> dict:
+    """Load the columns, rebuilding them from metadata when the file is missing or stale."""
+    try:
+        with np.load(path) as data:
+            attributes = {name: data[name] for name in data.files}
+        if metadata is None or len(attributes["price"]) == len(metadata):
+            return attributes
+    except (OSError, KeyError):
+        pass
+    if metadata is None:
+        raise FileNotFoundError(path)
+    return build_attributes(metadata)
+
+
+def filter_ids(attributes: dict, price_min: Optional[float] = None, price_max: Optional[float] = None,
+               rating_min: Optional[float] = None) -> Optional[np.ndarray]:
+    """Ids passing every range filter, or None when no filter is active.
+
+    Products with an unknown value never pass a filter on that column.
+    """
+    if price_min is None and price_max is None and rating_min is None:
+        return None
+    mask = np.ones(len(attributes["price"]), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        if price_min is not None:
+            mask &= attributes["price"] >= price_min
+        if price_max is not None:
+            mask &= attributes["price"] <= price_max
+        if rating_min is not None:
+            mask &= attributes["rating"] >= rating_min
+    return np.flatnonzero(mask).astype("int64")
+
+
+def _amount(number: str, thousands: Optional[str]) -> float:
+    value = float(number.replace(",", ""))
+    return value * 1000 if thousands else value
+
+
+def parse_query_constraints(query: str) -> dict:
+    """Pull price bounds like 'under $1500', 'over $200' or '$300-$500' out of free text."""
+    constraints = {}
+    match = _BETWEEN_RE.search(query)
+    if match:
+        low, high = _amount(match.group(1), match.group(2)), _amount(match.group(3), match.group(4))
+        constraints["price_min"], constraints["price_max"] = min(low, high), max(low, high)
+        return constraints
+    match = _UPPER_RE.search(query)
+    if match:
+        constraints["price_max"] = _amount(match.group(1), match.group(2))
+    match = _LOWER_RE.search(query)
+    if match:
+        constraints["price_min"] = _amount(match.group(1), match.group(2))
+    return constraints
@@ -0,0 +1,295 @@
+import time
+import bisect
+import argparse
+import threading
+from collections import Counter
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from query_router import normalize_query
+
+# ──────────────────────────────────────────────
+# ⚙️ Autocomplete settings
+# ──────────────────────────────────────────────
+PROMPT_WEIGHT = 3.0       # catalog prompts: picking one is served from precomputed results
+TITLE_WEIGHT = 1.0
+HISTORY_WEIGHT = 2.0      # per search of that exact query, across all sessions
+MAX_TITLES = 50_000       # memory cap: titles beyond this are not indexed
+MAX_HISTORY = 5_000       # distinct past queries kept (see HISTORY_DECAY for which go)
+HISTORY_DECAY = 0.9       # per merge: eviction ranks counts by recency, so new queries get in
+MAX_KEY_CHARS = 80        # completions are clipped to this many characters
+MERGE_EVERY = 256         # new searches buffered before a background merge into the sorted arrays
+CACHED_PREFIX_CHARS = 2   # top completions for 1–2 character prefixes are precomputed
+CACHED_TOP_N = 10
+DEFAULT_SUGGESTIONS = 5
+
+
+class _Snapshot(NamedTuple):
+    keys: List[str]          # normalized completions, sorted
+    weights: np.ndarray      # popularity, aligned with keys
+    display: List[str]       # text shown (and searched) for each key
+    known: np.ndarray        # key is a catalog prompt
+    top: Dict[str, np.ndarray]   # 1–2 char prefix → best positions, relative to the prefix's first key
+    merging: Counter         # searches being merged in the background (still scanned by lookups)
+
+
+class Completer:
+    """Prefix index over prompts, product titles and search history, ranked by popularity.
+
+    The index is parallel arrays sorted by normalized key (keys, weights, display
+    texts): a prefix maps to one contiguous slice found with two bisects, and its best
+    entries come from an argpartition over that slice (precomputed for 1–2 character
+    prefixes, whose slices are the largest). New searches go into a small buffer that
+    lookups scan directly; every ``MERGE_EVERY`` searches a background thread splices
+    them into the arrays and refreshes only the prefixes they touch. Lookups read an
+    immutable snapshot; safe across sessions.
+    """
+
+    def __init__(self, prompt_map: Dict[str, List[str]] = None, max_titles: int = MAX_TITLES,
+                 max_history: int = MAX_HISTORY):
+        self.max_titles = max_titles
+        self.max_history = max_history
+        self._prompts: Dict[str, str] = {}
+        self._titles: Dict[str, str] = {}
+        self._history: Dict[str, int] = {}
+        self._last_seen: Dict[str, int] = {}     # merge round a history key was last searched in
+        self._history_display: Dict[str, str] = {}
+        self._round = 0
+        self._pending = Counter()
+        self._pending_total = 0
+        self._lock = threading.Lock()         # pending buffer + snapshot swaps (held briefly)
+        self._build_lock = threading.Lock()   # one merge or rebuild at a time
+        self._merge_thread = None
+        self.titles_version = None
+        for prompts in (prompt_map or {}).values():
+            for prompt in prompts:
+                self._prompts.setdefault(self._key(prompt), prompt.strip())
+        self._snapshot = self._build()
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return normalize_query(text)[:MAX_KEY_CHARS]
+
+    def _weight(self, key: str) -> float:
+        return (PROMPT_WEIGHT * (key in self._prompts) + TITLE_WEIGHT * (key in self._titles)
+                + HISTORY_WEIGHT * self._history.get(key, 0))
+
+    def _display(self, key: str) -> str:
+        return self._prompts.get(key) or self._titles.get(key) or self._history_display[key]
+
+    def set_titles(self, metadata: List[dict], version: str = None):
+        """Replace the product titles (once per index release, full rebuild), capped at ``max_titles``."""
+        titles = {}
+        for item in metadata:
+            if len(titles) >= self.max_titles:
+                break
+            key = self._key(item.get("title") or "")
+            if key:
+                titles.setdefault(key, item["title"].strip()[:MAX_KEY_CHARS])
+        with self._build_lock:
+            self._titles = titles
+            self.titles_version = version
+            snapshot = self._build()
+            with self._lock:
+                self._snapshot = snapshot
+
+    def record(self, query: str):
+        """Count one search; every ``MERGE_EVERY`` searches are merged in on a background thread."""
+        key = self._key(query)
+        if not key:
+            return
+        with self._lock:
+            self._pending[key] += 1
+            self._pending_total += 1
+            self._history_display.setdefault(key, query.strip()[:MAX_KEY_CHARS])
+            if self._pending_total < MERGE_EVERY or (self._merge_thread and self._merge_thread.is_alive()):
+                return
+            self._merge_thread = threading.Thread(target=self.merge, name="autocomplete-merge", daemon=True)
+            self._merge_thread.start()
+
+    def merge(self):
+        """Fold buffered searches into the arrays (runs on the merge thread; callable directly)."""
+        with self._build_lock:
+            with self._lock:
+                batch, self._pending, self._pending_total = self._pending, Counter(), 0
+                snapshot = self._snapshot._replace(merging=batch)
+                self._snapshot = snapshot
+            if not batch:
+                return
+            self._round += 1
+            changed = set(batch)
+            for key, count in batch.items():
+                self._history[key] = self._history.get(key, 0) + count
+                self._last_seen[key] = self._round
+            changed |= self._evict()
+            merged = self._splice(snapshot, changed)
+            with self._lock:
+                self._snapshot = merged
+
+    def _evict(self) -> set:
+        """Drop history beyond ``max_history``: lowest decayed count first, then the longest unseen."""
+        excess = len(self._history) - self.max_history
+        if excess <= 0:
+            return set()
+        score = {key: count * HISTORY_DECAY ** (self._round - self._last_seen[key])
+                 for key, count in self._history.items()}
+        evicted = sorted(self._history, key=lambda k: (score[k], self._last_seen[k]))[:excess]
+        with self._lock:
+            for key in evicted:
+                del self._history[key], self._last_seen[key]
+                if key not in self._pending:
+                    self._history_display.pop(key, None)
+        return set(evicted)
+
+    def _build(self) -> _Snapshot:
+        """Full rebuild from the prompt, title and history tables."""
+        keys = sorted(set(self._prompts) | set(self._titles) | set(self._history))
+        weights = np.array([self._weight(k) for k in keys], dtype=np.float32)
+        display = [self._display(k) for k in keys]
+        known = np.array([k in self._prompts for k in keys], dtype=bool)
+        prefixes = {k[:length] for k in keys for length in range(1, CACHED_PREFIX_CHARS + 1) if len(k) >= length}
+        return _Snapshot(keys, weights, display, known, _prefix_tops(keys, weights, prefixes, {}), Counter())
+
+    def _splice(self, snapshot: _Snapshot, changed: set) -> _Snapshot:
+        """``snapshot`` with the weights of ``changed`` keys updated, new ones inserted and emptied ones removed."""
+        keys, weights, display, known = snapshot.keys, snapshot.weights.copy(), snapshot.display, snapshot.known
+        removed, added = [], []
+        for key in changed:
+            i = bisect.bisect_left(keys, key)
+            present = i < len(keys) and keys[i] == key
+            weight = self._weight(key)
+            if present and weight > 0:
+                weights[i] = weight
+            elif present:
+                removed.append(i)
+            elif weight > 0:
+                added.append(key)
+
+        if removed:
+            keep = np.ones(len(keys), dtype=bool)
+            keep[removed] = False
+            keys = [k for k, kept in zip(keys, keep) if kept]
+            display = [d for d, kept in zip(display, keep) if kept]
+            weights, known = weights[keep], known[keep]
+        if added:
+            added.sort()
+            positions = [bisect.bisect_left(keys, key) for key in added]
+            keys = _insert_sorted(keys, positions, added)
+            display = _insert_sorted(display, positions, [self._display(k) for k in added])
+            weights = np.insert(weights, positions, [self._weight(k) for k in added]).astype(np.float32)
+            known = np.insert(known, positions, [k in self._prompts for k in added])
+
+        prefixes = {k[:length] for k in changed for length in range(1, CACHED_PREFIX_CHARS + 1) if len(k) >= length}
+        return _Snapshot(keys, weights, display, known, _prefix_tops(keys, weights, prefixes, snapshot.top), Counter())
+
+    def complete(self, text: str, n: int = DEFAULT_SUGGESTIONS) -> List[Tuple[str, bool]]:
+        """Up to ``n`` (completion, is_catalog_prompt) pairs for what has been typed so far."""
+        prefix = self._key(text)
+        if not prefix:
+            return []
+        snapshot = self._snapshot
+        keys, weights, display, known = snapshot.keys, snapshot.weights, snapshot.display, snapshot.known
+        if prefix in snapshot.top and n <= CACHED_TOP_N:
+            idx = bisect.bisect_left(keys, prefix) + snapshot.top[prefix]
+        else:
+            lo, hi = _prefix_range(keys, prefix)
+            idx = lo + _top_n(weights[lo:hi], n)
+        scored = {keys[i]: (float(weights[i]), display[i], bool(known[i])) for i in idx}
+
+        # Searches not merged yet (a few hundred at most)
+        unmerged = Counter()
+        for buffer in (snapshot.merging, self._pending):
+            for key, count in list(buffer.items()):
+                if key.startswith(prefix):
+                    unmerged[key] += count
+        for key, count in unmerged.items():
+            i = bisect.bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                base, shown, is_known = float(weights[i]), display[i], bool(known[i])
+            else:
+                base, shown, is_known = 0.0, self._history_display.get(key, key), False
+            scored[key] = (base + HISTORY_WEIGHT * count, shown, is_known)
+
+        ranked = sorted(((w, k) for k, (w, _, _) in scored.items() if k != prefix), key=lambda x: (-x[0], x[1]))
+        return [(scored[k][1], scored[k][2]) for _, k in ranked[:n]]
+
+    def nbytes(self) -> int:
+        """Approximate size of the lookup arrays."""
+        snapshot = self._snapshot
+        text = sum(len(k) + len(d) for k, d in zip(snapshot.keys, snapshot.display))
+        return (text + snapshot.weights.nbytes + snapshot.known.nbytes
+                + sum(a.nbytes for a in snapshot.top.values()))
+
+    def __len__(self):
+        return len(self._snapshot.keys)
+
+
+def _prefix_range(keys: List[str], prefix: str) -> Tuple[int, int]:
+    return bisect.bisect_left(keys, prefix), bisect.bisect_left(keys, prefix + "\uffff")
+
+
+def _top_n(weights: np.ndarray, n: int) -> np.ndarray:
+    """Positions of the ``n`` largest weights, best first (ties keep key order)."""
+    if len(weights) > n:
+        candidates = np.argpartition(-weights, n - 1)[:n]
+        return candidates[np.lexsort((candidates, -weights[candidates]))]
+    return np.argsort(-weights, kind="stable")
+
+
+def _prefix_tops(keys: List[str], weights: np.ndarray, prefixes, previous: dict) -> dict:
+    """``previous`` with the cached best positions of ``prefixes`` recomputed (or dropped when empty).
+
+    Positions are relative to each prefix's first key, so prefixes whose slice didn't
+    change stay valid however many keys were inserted or removed elsewhere.
+    """
+    top = dict(previous)
+    for prefix in prefixes:
+        lo, hi = _prefix_range(keys, prefix)
+        if hi > lo:
+            top[prefix] = _top_n(weights[lo:hi], CACHED_TOP_N)
+        else:
+            top.pop(prefix, None)
+    return top
+
+
+def _insert_sorted(items: list, positions: List[int], new: list) -> list:
+    """``items`` with ``new[j]`` inserted before position ``positions[j]`` (positions ascending)."""
+    out, previous = [], 0
+    for position, item in zip(positions, new):
+        out.extend(items[previous:position])
+        out.append(item)
+        previous = position
+    out.extend(items[previous:])
+    return out
+
+
+if __name__ == "__main__":
+    import json
+    import os
+
+    from faiss_index import METADATA_FILE
+    from index_release import locate
+    from prompt_feeder import get_prompts_by_category
+
+    parser = argparse.ArgumentParser(description="Build the search-box prefix index and time lookups")
+    parser.add_argument("prefix", nargs="*", help="Prefixes to complete (default: a timing sweep only)")
+    parser.add_argument("-n", type=int, default=DEFAULT_SUGGESTIONS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    completer = Completer(get_prompts_by_category())
+    version, directory = locate()
+    if version is not None:
+        with open(os.path.join(directory, METADATA_FILE), "r", encoding="utf-8") as f:
+            completer.set_titles(json.load(f), version)
+    print(f"🔤 {len(completer)} completions, ~{completer.nbytes() / 1e6:.1f} MB, "
+          f"built in {1000 * (time.perf_counter() - start):.0f} ms")
+
+    sweep = [k[:length] for k in completer._snapshot.keys[::max(1, len(completer) // 500)] for length in (1, 3, 6)]
+    start = time.perf_counter()
+    for prefix in sweep:
+        completer.complete(prefix, args.n)
+    print(f"⏱️ {1e6 * (time.perf_counter() - start) / max(1, len(sweep)):.1f} µs per lookup ({len(sweep)} prefixes)")
+    for prefix in args.prefix:
+        print(f"{prefix!r}: " + ", ".join(f"{'⚡' if known else ''}{text}" for text, known in completer.complete(prefix, args.n)))
@@ -0,0 +1,270 @@
+import os
+import json
+import time
+import resource
+import argparse
+import platform
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import numpy as np
+
+import retrieval
+from faiss_index import EMBEDDING_MODEL
+from index_release import resolve_files
+from passages import PASSAGE_INDEX_FILE, PASSAGE_MAP_FILE, load_passages
+from precompute import PRECOMPUTED_FILE, PROMPT_EMBEDDINGS_FILE
+from prompt_feeder import get_prompts_by_category
+from query_router import QueryRouter, normalize_query
+
+# ──────────────────────────────────────────────
+# ⚙️ Benchmark defaults
+# ──────────────────────────────────────────────
+DEFAULT_K = 10
+DEFAULT_THREADS = (1, 4, 8)
+QPS_SECONDS = 3.0             # wall time per concurrency level
+SYNTHETIC_NOISE = 0.05        # spread of synthetic queries around their category centroid
+ROUTER_FOLDS = 5              # routed mode classifies each prompt with a router that never saw it
+RESULTS_FILE = "benchmark_results.json"
+MODES = ("raw", "mmr", "routed", "oracle", "passages", "passages_sum")
+# Scoped by the same category labels it is scored against: not a real search path
+ORACLE_MODES = {"oracle": "oracle upper bound"}
+PASSAGE_MODES = {"passages": "max", "passages_sum": "sum"}   # need a release built with --passages
+
+
+def load_queries(index, metadata, router, source: str, seed: int = 0):
+    """Return (keys, vectors, categories) for every catalog prompt with products in the index.
+
+    ``cached`` reads precompute.py's prompt embeddings (no API calls). ``synthetic``
+    places each query near its category's product centroid.
+    """
+    keys = [k for k in router.known if router.known[k] in router.shards]
+
+    if source == "cached":
+        with open(PRECOMPUTED_FILE, "r", encoding="utf-8") as f:
+            cached_keys = json.load(f)["embedding_keys"]
+        vectors = np.load(PROMPT_EMBEDDINGS_FILE)
+        rows = {k: i for i, k in enumerate(cached_keys)}
+        keys = [k for k in keys if k in rows]
+        vectors = vectors[[rows[k] for k in keys]]
+    else:
+        rng = np.random.default_rng(seed)
+        centroids = {}
+        for category, ids in router.shards.items():
+            sample = ids if len(ids) <= 256 else rng.choice(ids, 256, replace=False)
+            centroids[category] = retrieval.candidate_vectors(index, np.sort(sample)).mean(axis=0)
+        vectors = np.vstack([
+            centroids[router.known[k]] + rng.normal(0, SYNTHETIC_NOISE, index.d) for k in keys
+        ]).astype("float32")
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return keys, np.ascontiguousarray(vectors, dtype="float32"), [router.known[k] for k in keys]
+
+
+def held_out_routers(prompt_map: dict, folds: int = ROUTER_FOLDS) -> dict:
+    """{prompt key: router whose keyword classifier was trained without that prompt's fold}.
+
+    The benchmark queries *are* the catalog prompts, so the app's own router would
+    recognize them (and their label) or classify them from memory. Cross-fitting
+    keeps the routed score an estimate for queries the router hasn't seen.
+    """
+    pairs = [(category, prompt) for category, prompts in prompt_map.items() for prompt in prompts]
+    routers = {}
+    for fold in range(folds):
+        train = {}
+        for i, (category, prompt) in enumerate(pairs):
+            if i % folds != fold:
+                train.setdefault(category, []).append(prompt)
+        router = QueryRouter(train)
+        for i, (_, prompt) in enumerate(pairs):
+            if i % folds == fold:
+                routers.setdefault(normalize_query(prompt), router)
+    return routers
+
+
+def routed_category(router, key: str):
+    """Category a query is routed to by keywords alone (None below the router's confidence bar)."""
+    category, confidence = router.classify(key)
+    return category if confidence >= router.min_confidence else None
+
+
+def make_search(mode: str, index, metadata, router, k: int, passage_index=None, routers=None):
+    """Return fn(vector, query key) → ranked ids for one search path (``routers``: see held_out_routers)."""
+    if mode == "raw":
+        return lambda v, q: index.search(v[None, :], k)[1][0]
+    if mode == "mmr":
+        return lambda v, q: [r["id"] for r in retrieval.search(index, metadata, v, k)]
+    if mode == "routed":
+        return lambda v, q: [r["id"] for r in retrieval.search(
+            index, metadata, v, k, allowed_ids=router.shard_ids(routed_category(routers[q], q)))]
+    if mode == "oracle":
+        return lambda v, q: [r["id"] for r in retrieval.search(index, metadata, v, k,
+                                                               allowed_ids=router.shard_ids(router.known[q]))]
+    if mode in PASSAGE_MODES:
+        passage_index.aggregate = PASSAGE_MODES[mode]
+        return lambda v, q: [r["id"] for r in retrieval.search(index, metadata, v, k, passages=passage_index)]
+    raise ValueError(f"Unknown mode: {mode}")
+
+
+def quality_and_latency(search, vectors, keys, categories, labels, k: int) -> dict:
+    """recall@k / MRR against category labels plus single-thread latency percentiles."""
+    category_sizes = {c: int((labels == c).sum()) for c in set(categories)}
+    recalls, reciprocal_ranks, latencies = [], [], []
+    for vector, key, category in zip(vectors, keys, categories):
+        start = time.perf_counter()
+        ids = np.asarray(search(vector, key))
+        latencies.append(time.perf_counter() - start)
+
+        ids = ids[ids >= 0][:k]
+        relevant = labels[ids] == category if len(ids) else np.zeros(0, dtype=bool)
+        recalls.append(relevant.sum() / max(1, min(k, category_sizes[category])))
+        hits = np.flatnonzero(relevant)
+        reciprocal_ranks.append(1.0 / (hits[0] + 1) if len(hits) else 0.0)
+
+    lat_ms = np.asarray(latencies) * 1000
+    return {
+        f"recall@{k}": float(np.mean(recalls)),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "latency_ms": {
+            "p50": float(np.percentile(lat_ms, 50)),
+            "p95": float(np.percentile(lat_ms, 95)),
+            "p99": float(np.percentile(lat_ms, 99)),
+            "mean": float(lat_ms.mean()),
+        },
+    }
+
+
+def throughput(search, vectors, keys, threads: int, seconds: float = QPS_SECONDS) -> float:
+    """Queries/sec with ``threads`` concurrent callers cycling through the query set."""
+    deadline = time.perf_counter() + seconds
+
+    def worker(offset):
+        done, i = 0, offset
+        while time.perf_counter() < deadline:
+            search(vectors[i % len(vectors)], keys[i % len(vectors)])
+            done += 1
+            i += threads
+        return done
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        total = sum(executor.map(worker, range(threads)))
+    return total / (time.perf_counter() - start)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if platform.system() == "Darwin" else rss / 1024
+
+
+def run_benchmark(index_file=None, metadata_file=None, queries="synthetic",
+                  k=DEFAULT_K, modes=MODES, threads=DEFAULT_THREADS, qps_seconds=QPS_SECONDS) -> dict:
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    _, index_file, metadata_file = resolve_files(index_file, metadata_file)
+    index = faiss.read_index(index_file)
+    with open(metadata_file, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    passage_index = load_passages(os.path.dirname(index_file))
+    load_seconds = time.perf_counter() - start
+
+    router = QueryRouter(get_prompts_by_category())
+    router.set_shards(metadata)
+    labels = np.array([m.get("category") or "" for m in metadata])
+    keys, vectors, categories = load_queries(index, metadata, router, queries)
+    routers = held_out_routers(get_prompts_by_category())
+    print(f"📏 {index.ntotal} products, {len(keys)} labelled queries ({queries} embeddings)")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "index": {
+            "file": index_file,
+            "type": type(index).__name__,
+            "ntotal": int(index.ntotal),
+            "dim": int(index.d),
+            "bytes": os.path.getsize(index_file),
+            "load_seconds": load_seconds,
+            "embedding_model": EMBEDDING_MODEL,
+        },
+        "passages": None,
+        "queries": {"source": queries, "count": len(keys)},
+        "k": k,
+        "modes": {},
+    }
+    index_bytes = report["index"]["bytes"]
+    if passage_index is not None:
+        directory = os.path.dirname(index_file)
+        passage_bytes = sum(os.path.getsize(os.path.join(directory, f)) for f in (PASSAGE_INDEX_FILE, PASSAGE_MAP_FILE))
+        report["passages"] = {
+            "count": int(passage_index.index.ntotal),
+            "per_product": passage_index.index.ntotal / max(1, index.ntotal),
+            "bytes": passage_bytes,
+        }
+        print(f"✂️ {passage_index.index.ntotal} passages ({report['passages']['per_product']:.1f}/product), "
+              f"{passage_bytes / 1e6:.1f} MB on top of the {index_bytes / 1e6:.1f} MB product index")
+
+    for mode in modes:
+        if mode in PASSAGE_MODES and passage_index is None:
+            print(f"⚠️ Skipping {mode}: this index was built without --passages")
+            continue
+        search = make_search(mode, index, metadata, router, k, passage_index, routers)
+        result = quality_and_latency(search, vectors, keys, categories, labels, k)
+        if mode == "routed":
+            routes = [routed_category(routers[key], key) for key in keys]
+            result["route_accuracy"] = float(np.mean([r == c for r, c in zip(routes, categories)]))
+            result["routed_share"] = float(np.mean([router.shard_ids(r) is not None for r in routes]))
+        if mode in ORACLE_MODES:
+            result["label"] = ORACLE_MODES[mode]
+        # What this mode has to keep in memory: passage modes still need the product index for MMR
+        result["index_bytes"] = index_bytes + (report["passages"]["bytes"] if mode in PASSAGE_MODES else 0)
+        result["qps"] = {str(t): throughput(search, vectors, keys, t, qps_seconds) for t in threads}
+        report["modes"][mode] = result
+        lat = result["latency_ms"]
+        print(f"⏱️ {mode:<12} {result['index_bytes'] / 1e6:7.1f} MB  recall@{k} {result[f'recall@{k}']:.3f}  MRR {result['mrr']:.3f}  "
+              f"p50 {lat['p50']:.2f}ms  p95 {lat['p95']:.2f}ms  p99 {lat['p99']:.2f}ms  "
+              + "  ".join(f"{t}T {q:,.0f} q/s" for t, q in result["qps"].items())
+              + (f"  ({result['label']})" if "label" in result else "")
+              + (f"  routed {result['routed_share']:.0%}, {result['route_accuracy']:.0%} to the right category"
+                 if "route_accuracy" in result else ""))
+
+    report["memory_mb"] = {"peak_rss": peak_rss_mb(), "peak_rss_before_load": rss_before}
+    return report
+
+
+def compare(report: dict, baseline: dict):
+    """Print metric deltas against a previous run."""
+    k = report["k"]
+    for mode, result in report["modes"].items():
+        old = baseline.get("modes", {}).get(mode)
+        if not old or f"recall@{k}" not in old:
+            continue
+        print(f"🔁 {mode:<12} recall@{k} {result[f'recall@{k}'] - old[f'recall@{k}']:+.3f}  "
+              f"MRR {result['mrr'] - old['mrr']:+.3f}  "
+              f"p95 {result['latency_ms']['p95'] - old['latency_ms']['p95']:+.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieval quality + latency benchmark (no API calls)")
+    parser.add_argument("--index", help="Index file (default: the live release)")
+    parser.add_argument("--metadata", help="Metadata file (default: the live release)")
+    parser.add_argument("--queries", choices=["synthetic", "cached"], default="synthetic",
+                        help="cached = prompt embeddings written by precompute.py")
+    parser.add_argument("-k", type=int, default=DEFAULT_K)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--threads", default=",".join(map(str, DEFAULT_THREADS)))
+    parser.add_argument("--qps-seconds", type=float, default=QPS_SECONDS)
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", help="Previous results file to diff against")
+    args = parser.parse_args()
+    if bool(args.index) != bool(args.metadata):
+        parser.error("--index and --metadata must be given together (or neither, for the live release)")
+
+    report = run_benchmark(args.index, args.metadata, args.queries, args.k, args.modes.split(","),
+                           [int(t) for t in args.threads.split(",")], args.qps_seconds)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results saved to {args.output}")
@@ -0,0 +1,116 @@
+import json
+import time
+import argparse
+
+import numpy as np
+
+import scrape_results
+from page_archive import PAGE_ARCHIVE_FILE, parseable_pages
+
+# ──────────────────────────────────────────────
+# ⚙️ Benchmark defaults
+# ──────────────────────────────────────────────
+DEFAULT_ROUNDS = 3
+DEFAULT_WORKERS = 20          # same pool size as scrape_prompt
+RESULTS_FILE = "crawl_benchmark_results.json"
+MODES = ("extract", "crawl")
+
+
+def bench_extract(pages: dict, rounds: int = DEFAULT_ROUNDS) -> dict:
+    """Decode + parse every archived HTML page, ``rounds`` times, single-threaded."""
+    html = parseable_pages(pages)
+    if not html:
+        return {}
+    latencies, products = [], 0
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    for _ in range(rounds):
+        for page in html:
+            start = time.perf_counter()
+            res = scrape_results.decode_page(page["final_url"], page["status"], page["headers"], page["body"])
+            try:
+                products += scrape_results.parse_product_page(page["url"], res) is not None
+            except Exception as e:
+                print(f"❌ Failed to parse {page['url']}: {e}")
+            latencies.append(time.perf_counter() - start)
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+    n = len(latencies)
+    lat_ms = np.asarray(latencies) * 1000
+    return {
+        "pages": n,
+        "products": products // rounds,
+        "pages_per_sec": n / wall,
+        "cpu_ms_per_page": 1000 * cpu / n,
+        "latency_ms": {"p50": float(np.percentile(lat_ms, 50)), "p95": float(np.percentile(lat_ms, 95)),
+                       "max": float(lat_ms.max())},
+    }
+
+
+def bench_crawl(searches: dict, workers: int = DEFAULT_WORKERS) -> dict:
+    """Run scrape_prompt for every archived search against the replayed responses."""
+    if not searches:
+        return {}
+    pages = products = 0
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    for prompt, links in searches.items():
+        pages += len(links)
+        products += len(scrape_results.scrape_prompt(prompt, workers, search_fn=searches.get))
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    return {
+        "prompts": len(searches),
+        "pages": pages,
+        "products": products,
+        "workers": workers,
+        "pages_per_sec": pages / wall,
+        "cpu_ms_per_page": 1000 * cpu / max(pages, 1),
+    }
+
+
+def run_benchmark(archive_path=PAGE_ARCHIVE_FILE, modes=MODES, rounds=DEFAULT_ROUNDS,
+                  workers=DEFAULT_WORKERS) -> dict:
+    pages, searches = scrape_results.use_replay(archive_path)
+    print(f"📂 {len(pages)} archived responses, {len(searches)} archived searches")
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "archive": {"file": archive_path, "responses": len(pages), "searches": len(searches)},
+        "modes": {},
+    }
+    for mode in modes:
+        result = bench_extract(pages, rounds) if mode == "extract" else bench_crawl(searches, workers)
+        if not result:
+            print(f"⚠️ Nothing to replay for {mode}")
+            continue
+        report["modes"][mode] = result
+        print(f"⏱️ {mode:<7} {result['pages']} pages  {result['pages_per_sec']:.1f} pages/s  "
+              f"CPU {result['cpu_ms_per_page']:.1f} ms/page  {result['products']} products")
+    return report
+
+
+def compare(report: dict, baseline: dict):
+    """Print throughput / CPU deltas against a previous run."""
+    for mode, result in report["modes"].items():
+        old = baseline.get("modes", {}).get(mode)
+        if not old:
+            continue
+        print(f"🔁 {mode:<7} pages/s {result['pages_per_sec'] - old['pages_per_sec']:+.1f}  "
+              f"CPU/page {result['cpu_ms_per_page'] - old['cpu_ms_per_page']:+.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawler benchmark over an offline page archive (no network)")
+    parser.add_argument("--archive", default=PAGE_ARCHIVE_FILE,
+                        help="Recorded with: python scrape_results.py --record")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="Passes over the pages in extract mode")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", help="Previous results file to diff against")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.archive, args.modes.split(","), args.rounds, args.workers)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results saved to {args.output}")
@@ -0,0 +1,117 @@
+import time
+from collections import defaultdict
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import telemetry
+
+# ──────────────────────────────────────────────
+# 📊 Crawl metric names
+# ──────────────────────────────────────────────
+FETCH_PHASES = ("crawl_connect", "crawl_tls", "crawl_ttfb", "crawl_download")   # connect includes DNS
+PARSE_PHASES = ("crawl_parse_readability", "crawl_parse_soup", "crawl_parse_regex")
+PAGES_METRIC = "crawl_pages_total"      # labels: domain, outcome
+BYTES_METRIC = "crawl_bytes_total"      # labels: domain
+ERROR_OUTCOMES = ("error", "throttled", "refused", "blocked")
+
+_started = time.perf_counter()
+
+
+class _TimedConnectionMixin:
+    """Times connection setup (DNS + TCP connect) around urllib3's own ``_new_conn``.
+
+    Wrapping instead of reimplementing keeps urllib3's address-family selection,
+    socket options and proxy handling; DNS and connect are therefore one phase.
+    """
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        sock = super()._new_conn()
+        self._tcp_seconds = time.perf_counter() - start
+        telemetry.record("crawl_connect", self._tcp_seconds)
+        return sock
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        self._tcp_seconds = None
+        start = time.perf_counter()
+        super().connect()
+        if self._tcp_seconds is not None:
+            telemetry.record("crawl_tls", time.perf_counter() - start - self._tcp_seconds)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose new connections report DNS / connect / TLS timings."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+def record_page(domain: str, outcome: str, nbytes: int = 0):
+    """Count one fetch attempt per domain; outcome is ok / skipped / error / throttled / refused.
+
+    ``blocked`` is the exception: a bot-check page found while parsing a page that was
+    already counted as ``ok``, so it adds an error without adding an attempt.
+    """
+    telemetry.count(PAGES_METRIC, domain=domain, outcome=outcome)
+    if nbytes:
+        telemetry.count(BYTES_METRIC, nbytes, domain=domain)
+
+
+def domain_stats() -> dict:
+    """{domain: {"pages", "errors", "error_rate", "bytes"}} from the counters so far."""
+    stats = defaultdict(lambda: {"pages": 0, "errors": 0, "bytes": 0})
+    for key, n in telemetry.REGISTRY.counter_values(PAGES_METRIC).items():
+        labels = dict(key)
+        entry = stats[labels["domain"]]
+        if labels["outcome"] != "blocked":  # the bot-check page was already counted as fetched
+            entry["pages"] += n
+        if labels["outcome"] in ERROR_OUTCOMES:
+            entry["errors"] += n
+    for key, n in telemetry.REGISTRY.counter_values(BYTES_METRIC).items():
+        stats[dict(key)["domain"]]["bytes"] += n
+    for entry in stats.values():
+        entry["error_rate"] = entry["errors"] / entry["pages"] if entry["pages"] else 0.0
+    return dict(stats)
+
+
+def report(top_domains: int = 10) -> str:
+    """Human-readable crawl summary: throughput, bytes, phase timings and worst domains."""
+    elapsed = max(time.perf_counter() - _started, 1e-9)
+    domains = domain_stats()
+    ok = sum(n for key, n in telemetry.REGISTRY.counter_values(PAGES_METRIC).items()
+             if dict(key)["outcome"] == "ok")
+    attempts = sum(d["pages"] for d in domains.values())
+    total_bytes = sum(d["bytes"] for d in domains.values())
+
+    lines = [f"📊 {ok:.0f}/{attempts:.0f} pages ok in {elapsed:.1f}s ({ok / elapsed:.2f} pages/s), "
+             f"{total_bytes / 1e6:.1f} MB downloaded"]
+    for name in FETCH_PHASES + PARSE_PHASES:
+        stats = telemetry.REGISTRY.span_stats(name)
+        if stats:
+            lines.append(f"   {name[6:]:<18} n={stats['count']:<6} mean {1000 * stats['mean']:8.1f} ms  "
+                         f"p50 ≤{1000 * stats['p50']:g} ms  p95 ≤{1000 * stats['p95']:g} ms")
+    worst = sorted(domains.items(), key=lambda kv: (-kv[1]["error_rate"], -kv[1]["pages"]))[:top_domains]
+    for domain, d in worst:
+        if d["errors"]:
+            lines.append(f"   ⚠️ {domain:<30} {d['errors']:.0f}/{d['pages']:.0f} failed ({d['error_rate']:.0%})")
+    return "\n".join(lines)
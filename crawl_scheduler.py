@@ -0,0 +1,186 @@
+import threading
+import time
+from urllib import robotparser
+from urllib.parse import urlparse
+
+import requests
+
+# ──────────────────────────────────────────────
+# ⚙️ Politeness defaults
+# ──────────────────────────────────────────────
+DEFAULT_RATE = 1.0             # requests/sec per domain when robots.txt says nothing
+DEFAULT_BURST = 2              # tokens a domain may accumulate while idle
+MIN_CONCURRENCY = 1            # AIMD floor per domain
+MAX_CONCURRENCY = 4            # AIMD ceiling per domain
+MIN_RATE = 0.05                # never slow a domain below one request per 20s
+ROBOTS_TIMEOUT = 5
+
+# Markers of bot-check / block interstitials that retailers return with a 200
+BLOCK_MARKERS = (
+    "robot or human",
+    "are you a robot",
+    "are you a human",
+    "verify you are human",
+    "access denied",
+    "captcha",
+    "unusual traffic",
+    "request blocked",
+    "pardon our interruption",
+    "press & hold",
+    "attention required",
+    "just a moment...",
+)
+
+
+def is_blocked_page(status_code, title, text=""):
+    """Return True for throttling responses and bot-check pages that must not be indexed."""
+    if status_code in (403, 429, 503):
+        return True
+    title = (title or "").lower()
+    if any(marker in title for marker in BLOCK_MARKERS):
+        return True
+    # Interstitials are short; a real product page mentioning "captcha" in a review is not
+    text = text or ""
+    return len(text) < 2000 and any(marker in text.lower() for marker in BLOCK_MARKERS)
+
+
+class _DomainState:
+    """Token bucket + AIMD concurrency window for one domain."""
+
+    def __init__(self, rate, burst, limit=MIN_CONCURRENCY):
+        self.rate = rate
+        self.base_rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.limit = float(limit)
+        self.in_flight = 0
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class DomainScheduler:
+    """Per-domain politeness: token buckets, robots.txt crawl-delay and AIMD concurrency.
+
+    Every fetch is bracketed by ``acquire(url)`` / ``release(url, outcome)``. Successful
+    fetches grow the domain's concurrency window additively; throttling (429/503) or
+    ``report_blocked`` halves both the window and the request rate.
+    """
+
+    def __init__(self, user_agent="*", default_rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+                 max_concurrency=MAX_CONCURRENCY, respect_robots=True, initial_concurrency=MIN_CONCURRENCY):
+        self.user_agent = user_agent
+        self.default_rate = default_rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.respect_robots = respect_robots
+        self.initial_concurrency = initial_concurrency
+        self._domains = {}
+        self._robots = {}
+        self._cond = threading.Condition()
+
+    def configure(self, **settings):
+        """Change pacing settings (any __init__ argument); every domain starts over with them."""
+        with self._cond:
+            for name, value in settings.items():
+                if name not in ("user_agent", "default_rate", "burst", "max_concurrency",
+                                "respect_robots", "initial_concurrency"):
+                    raise TypeError(f"unknown scheduler setting: {name}")
+                setattr(self, name, value)
+            self._domains.clear()
+            self._cond.notify_all()
+
+    @staticmethod
+    def domain_of(url):
+        netloc = urlparse(url).netloc.lower()
+        return netloc[4:] if netloc.startswith("www.") else netloc
+
+    # ── robots.txt ─────────────────────────────
+    def _robots_for(self, url):
+        parsed = urlparse(url)
+        key = f"{parsed.scheme}://{parsed.netloc}"
+        if key not in self._robots:
+            parser = robotparser.RobotFileParser()
+            try:
+                res = requests.get(f"{key}/robots.txt", timeout=ROBOTS_TIMEOUT,
+                                   headers={"User-Agent": self.user_agent})
+                if res.status_code >= 400:
+                    parser.parse([])
+                else:
+                    parser.parse(res.text.splitlines())
+            except Exception:
+                parser.parse([])
+            self._robots[key] = parser
+        return self._robots[key]
+
+    def allowed(self, url):
+        """Return False when robots.txt disallows fetching this URL."""
+        if not self.respect_robots:
+            return True
+        return self._robots_for(url).can_fetch(self.user_agent, url)
+
+    def _state(self, url):
+        domain = self.domain_of(url)
+        state = self._domains.get(domain)
+        if state is None:
+            rate = self.default_rate
+            if self.respect_robots:
+                robots = self._robots_for(url)
+                delay = robots.crawl_delay(self.user_agent)
+                req_rate = robots.request_rate(self.user_agent)
+                if delay:
+                    rate = min(rate, 1.0 / float(delay))
+                if req_rate and req_rate.seconds:
+                    rate = min(rate, req_rate.requests / req_rate.seconds)
+            state = self._domains[domain] = _DomainState(rate, self.burst, self.initial_concurrency)
+        return state
+
+    # ── acquire / release ──────────────────────
+    def acquire(self, url):
+        """Block until the URL's domain has a free concurrency slot and a rate token."""
+        if self.respect_robots:
+            self._robots_for(url)  # fetched outside the lock; cached afterwards
+        with self._cond:
+            state = self._state(url)
+            while True:
+                now = time.monotonic()
+                state.refill(now)
+                if state.in_flight < int(state.limit) and state.tokens >= 1:
+                    state.tokens -= 1
+                    state.in_flight += 1
+                    return
+                wait = (1 - state.tokens) / state.rate if state.tokens < 1 else None
+                self._cond.wait(timeout=wait)
+
+    def release(self, url, outcome="ok"):
+        """Return the slot and adapt the domain: 'ok' grows it, 'throttled' shrinks it."""
+        with self._cond:
+            state = self._state(url)
+            state.in_flight = max(0, state.in_flight - 1)
+            if outcome == "ok":
+                state.limit = min(self.max_concurrency, state.limit + 1.0 / state.limit)
+                state.rate = min(state.base_rate, state.rate * 1.1)
+            elif outcome == "throttled":
+                self._backoff(state)
+            self._cond.notify_all()
+
+    def report_blocked(self, url):
+        """Shrink a domain after its response turned out to be a bot-check page."""
+        with self._cond:
+            self._backoff(self._state(url))
+
+    @staticmethod
+    def _backoff(state):
+        state.limit = max(MIN_CONCURRENCY, state.limit / 2)
+        state.rate = max(MIN_RATE, state.rate / 2)
+        state.tokens = min(state.tokens, 0)
+
+    def snapshot(self):
+        """Return the current per-domain window and rate, for logging."""
+        with self._cond:
+            return {
+                domain: {"limit": round(s.limit, 2), "rate": round(s.rate, 3), "in_flight": s.in_flight}
+                for domain, s in self._domains.items()
+            }
@@ -0,0 +1,130 @@
+import re
+import hashlib
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import numpy as np
+
+# ──────────────────────────────────────────────
+# ⚙️ Near-duplicate settings
+# ──────────────────────────────────────────────
+SHINGLE_SIZE = 3          # words per shingle
+MAX_DISTANCE = 3          # Hamming distance at which two 64-bit SimHashes count as duplicates
+MIN_TOKENS = 20           # shorter texts are only deduplicated by URL
+BANDS = 4                 # > MAX_DISTANCE, so every match shares at least one exact band
+BAND_BITS = 64 // BANDS
+
+# Query parameters that never change which product a URL points at
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "srsltid", "ref", "ref_", "tag", "psc", "th", "_encoding"}
+
+_WORD_RE = re.compile(r"\w+")
+_BIT_SHIFTS = np.arange(64, dtype=np.uint64)
+
+
+def canonical_url(url: str) -> str:
+    """Normalize a URL so the same listing reached via tracking links compares equal."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash over word shingles, or None when the text is too short to trust."""
+    tokens = _WORD_RE.findall(text.lower())
+    if len(tokens) < MIN_TOKENS:
+        return None
+    shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    # Per-bit majority vote across all shingle hashes
+    bits = (hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)
+    votes = bits.sum(axis=0) * 2 > len(hashes)
+    return int((votes.astype(np.uint64) << _BIT_SHIFTS).sum())
+
+
+class NearDuplicateIndex:
+    """Incremental duplicate detector: exact canonical URL plus SimHash within MAX_DISTANCE.
+
+    Fingerprints are bucketed by each of their BANDS bit ranges, so a lookup only
+    compares against fingerprints sharing a band instead of the whole corpus.
+    """
+
+    def __init__(self, max_distance: int = MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.urls = {}
+        self.fingerprints = {}
+        self.buckets = [dict() for _ in range(BANDS)]
+        self._next_key = 0
+
+    @staticmethod
+    def _bands(fp: int):
+        mask = (1 << BAND_BITS) - 1
+        return [(fp >> (b * BAND_BITS)) & mask for b in range(BANDS)]
+
+    def find(self, url: str, fp: Optional[int]):
+        """Return the key of an existing duplicate, or None."""
+        key = self.urls.get(canonical_url(url))
+        if key is not None or fp is None:
+            return key
+        for band, value in enumerate(self._bands(fp)):
+            for other in self.buckets[band].get(value, ()):
+                if bin(fp ^ self.fingerprints[other]).count("1") <= self.max_distance:
+                    return other
+        return None
+
+    def add(self, key, url: str, fp: Optional[int]):
+        self.urls[canonical_url(url)] = key
+        if fp is not None:
+            self.fingerprints[key] = fp
+            for band, value in enumerate(self._bands(fp)):
+                self.buckets[band].setdefault(value, []).append(key)
+
+    def remove(self, url: str):
+        """Forget the record registered under ``url`` (e.g. it failed downstream and should be retried)."""
+        key = self.urls.pop(canonical_url(url), None)
+        fp = self.fingerprints.pop(key, None)
+        if fp is not None:
+            for band, value in enumerate(self._bands(fp)):
+                bucket = self.buckets[band].get(value, [])
+                if key in bucket:
+                    bucket.remove(key)
+
+    def check(self, product: dict) -> bool:
+        """Register ``product`` and return True if it is not a duplicate of anything seen."""
+        fp = simhash(product.get("full_text", ""))
+        if self.find(product["url"], fp) is not None:
+            return False
+        self.add(self._next_key, product["url"], fp)
+        self._next_key += 1
+        return True
+
+
+def dedupe_products(products: List[dict]) -> Tuple[List[dict], int]:
+    """Collapse near-duplicate clusters to one record each; returns (kept, removed_count).
+
+    ``products`` are in write order (as the store yields them), and the canonical record
+    of a cluster is its newest member, the same rule ``SegmentStore.compact`` applies
+    per URL, so a fresh re-crawl always replaces a stale copy.
+    """
+    index = NearDuplicateIndex()
+    kept = []
+    for product in products:
+        fp = simhash(product.get("full_text", ""))
+        slot = index.find(product["url"], fp)
+        if slot is None:
+            index.add(len(kept), product["url"], fp)
+            kept.append(product)
+        else:
+            index.urls.setdefault(canonical_url(product["url"]), slot)
+            kept[slot] = product
+    return kept, len(products) - len(kept)
@@ -1,14 +1,14 @@
 import os
 import json
-import faiss
-import openai
+import threading
+import numpy as np
 from tqdm import tqdm
 from typing import List
-from openai import OpenAI
-from pathlib import Path
 
-# ✅ Hardcoded OpenAI API key (your request)
-client = OpenAI(api_key="OPENAI_API_KEY")
+from attributes import ATTRIBUTES_FILE, build_attributes, save_attributes
+from dedupe import dedupe_products
+from scrape_store import SegmentStore
+from telemetry import span
 
 # Directory containing category folders of JSONL product data
 SCRAPED_RESULTS_DIR = "scraped_results"
@@ -17,106 +17,175 @@ SCRAPED_RESULTS_DIR = "scraped_results"
 FAISS_INDEX_FILE = "product_faiss.index"
 METADATA_FILE = "product_metadata.json"
 
+EMBEDDING_MODEL = "text-embedding-3-small"
+BATCH_SIZE = 100  # tweak to 50–200 depending on your rate limit
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Create the OpenAI client on first use, reading OPENAI_API_KEY from the environment.
+
+    openai (and faiss, below) are imported where they are used: importing them costs
+    about a second, which every importer of this module (the app included) would pay.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+            _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
 def load_all_jsonl_files(base_dir: str) -> List[dict]:
-    """Recursively loads all .jsonl product entries from the base directory"""
-    all_entries = []
-    base_path = Path(base_dir)
-
-    for file_path in base_path.rglob("*.jsonl"):
-        category = file_path.parent.name
-        with open(file_path, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    entry = json.loads(line.strip())
-                    if entry.get("full_text") and entry.get("title"):
-                        entry["category"] = category
-                        all_entries.append(entry)
-                except json.JSONDecodeError:
-                    print(f"⚠️ Skipping invalid JSON in {file_path}")
-    return all_entries
+    """Loads all product entries from the segment store (and any legacy .jsonl files)"""
+    return [
+        entry for entry in SegmentStore(base_dir).iter_records()
+        if entry.get("full_text") and entry.get("title")
+    ]
 
 def get_embedding(text: str) -> List[float]:
     """Calls OpenAI API to get embedding"""
     try:
-        response = client.embeddings.create(
+        response = get_client().embeddings.create(
             input=text,
-            model="text-embedding-3-small"
+            model=EMBEDDING_MODEL
         )
         return response.data[0].embedding
     except Exception as e:
         print(f"❌ Failed to embed: {e}")
         return None
 
-def build_faiss_index():
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """Embeds a batch of texts in a single API call (raises on failure)"""
+    with span("embedding_api"):
+        response = get_client().embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=texts
+        )
+    return [item.embedding for item in response.data]
+
+def product_text(product: dict) -> str:
+    """Text that represents a product in embedding space"""
+    return f"{product['title']}\n{product.get('summary', '')}\n{product.get('full_text', '')}"
+
+def product_metadata(product: dict) -> dict:
+    """Fields kept alongside the vector for display and filtering"""
+    return {
+        "title": product["title"],
+        "summary": product.get("summary"),
+        "url": product["url"],
+        "price": product.get("price"),
+        "rating": product.get("rating"),
+        "category": product.get("category"),
+        "source": product.get("source")
+    }
+
+def save_index(index, metadata: List[dict], index_file: str = FAISS_INDEX_FILE, metadata_file: str = METADATA_FILE,
+               attributes_file: str = ATTRIBUTES_FILE):
+    """Writes index, metadata and numeric attributes via temp files + rename so readers never see a partial file"""
+    import faiss
+    faiss.write_index(index, index_file + ".tmp")
+    with open(metadata_file + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    save_attributes(build_attributes(metadata), attributes_file + ".tmp")
+    # Metadata first: a reader that sees the new index must already find matching metadata
+    os.replace(attributes_file + ".tmp", attributes_file)
+    os.replace(metadata_file + ".tmp", metadata_file)
+    os.replace(index_file + ".tmp", index_file)
+
+def index_version(index_file: str = FAISS_INDEX_FILE, metadata_file: str = METADATA_FILE) -> str:
+    """Identifies one published index; changes whenever either file is rewritten"""
+    parts = []
+    for path in (index_file, metadata_file):
+        stat = os.stat(path)
+        parts.append(f"{stat.st_size}-{stat.st_mtime_ns}")
+    return "/".join(parts)
+
+def build_faiss_index(use_passages: bool = False):
+    import faiss
     print("🔍 Loading product entries...")
-    products = load_all_jsonl_files(SCRAPED_RESULTS_DIR)
+    with span("build_load_products"):
+        products = load_all_jsonl_files(SCRAPED_RESULTS_DIR)
     print(f"✅ Loaded {len(products)} products")
 
     if not products:
         print("⚠️ No valid product data found.")
         return
 
-    embeddings = []
-    metadata = []
-
-    print("🧠 Generating embeddings in batches...")
-
-    BATCH_SIZE = 100  # tweak to 50–200 depending on your rate limit
-    embeddings = []
-    metadata = []
-
-    batch_texts = []
-    batch_meta = []
-
-    for i, product in enumerate(tqdm(products, desc="Batching")):
-        text = f"{product['title']}\n{product.get('summary', '')}\n{product.get('full_text', '')}"
-        batch_texts.append(text)
-        batch_meta.append({
-            "title": product["title"],
-            "url": product["url"],
-            "price": product.get("price"),
-            "rating": product.get("rating"),
-            "category": product.get("category")
-        })
-
-        # when batch is full or last product reached
-        if len(batch_texts) >= BATCH_SIZE or i == len(products) - 1:
-            try:
-                response = client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=batch_texts
-                )
-                # store all embeddings + their metadata
-                for j, item in enumerate(response.data):
-                    embeddings.append(item.embedding)
-                    metadata.append(batch_meta[j])
-
-                print(f"✅ Embedded batch {len(embeddings)} total so far")
-            except Exception as e:
-                print(f"❌ Batch failed: {e}")
-
-            # reset for next batch
-            batch_texts.clear()
-            batch_meta.clear()
-
-
-    if not embeddings:
+    with span("build_dedupe"):
+        products, removed = dedupe_products(products)
+    print(f"🧹 Removed {removed} near-duplicates, {len(products)} products left to embed")
+
+    passages = None
+    if use_passages:
+        # Multi-vector mode: overlapping full_text passages; the product vector is their mean
+        from passages import embed_products
+        print("🧠 Generating passage embeddings in batches...")
+        with span("build_embed_passages"):
+            metadata, embeddings, passage_vectors, passage_products = embed_products(products)
+    else:
+        embeddings = []
+        metadata = []
+
+        print("🧠 Generating embeddings in batches...")
+
+        embeddings = []
+        metadata = []
+
+        batch_texts = []
+        batch_meta = []
+
+        for i, product in enumerate(tqdm(products, desc="Batching")):
+            batch_texts.append(product_text(product))
+            batch_meta.append(product_metadata(product))
+
+            # when batch is full or last product reached
+            if len(batch_texts) >= BATCH_SIZE or i == len(products) - 1:
+                try:
+                    # store all embeddings + their metadata
+                    for j, vector in enumerate(embed_texts(batch_texts)):
+                        embeddings.append(vector)
+                        metadata.append(batch_meta[j])
+
+                    print(f"✅ Embedded batch {len(embeddings)} total so far")
+                except Exception as e:
+                    print(f"❌ Batch failed: {e}")
+
+                # reset for next batch
+                batch_texts.clear()
+                batch_meta.clear()
+
+    if not len(metadata):
         print("❌ No embeddings generated.")
         return
 
     print("📦 Building FAISS index...")
     dim = len(embeddings[0])
-    index = faiss.IndexFlatL2(dim)
-    index.add(np.array(embeddings).astype("float32"))
-
-    # Save
-    faiss.write_index(index, FAISS_INDEX_FILE)
-    with open(METADATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2)
-
-    print(f"✅ Index saved to {FAISS_INDEX_FILE}")
-    print(f"✅ Metadata saved to {METADATA_FILE}")
+    with span("build_index_add"):
+        index = faiss.IndexFlatL2(dim)
+        index.add(np.array(embeddings).astype("float32"))
+        if use_passages:
+            passage_index = faiss.IndexFlatL2(dim)
+            passage_index.add(passage_vectors)
+            passages = (passage_index, passage_products)
+
+    # Publish as a new versioned release (the app switches over on its next rerun)
+    from index_release import publish
+    with span("build_save_index"):
+        release = publish(index, metadata, passages=passages)
+
+    print(f"✅ Index and metadata published as release {release}")
+
+    # "More like this" graph for the app's product cards
+    from similar_items import build_and_save
+    with span("build_similar_items"):
+        build_and_save(index=index, version=release)
 
 if __name__ == "__main__":
-    import numpy as np
-    build_faiss_index()
+    import argparse
+    parser = argparse.ArgumentParser(description="Embed scraped products and publish a new index release")
+    parser.add_argument("--passages", action="store_true",
+                        help="Also index overlapping full_text passages (multi-vector search)")
+    args = parser.parse_args()
+    build_faiss_index(use_passages=args.passages)
@@ -0,0 +1,162 @@
+import html
+import time
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List
+
+import numpy as np
+
+import telemetry
+
+# ──────────────────────────────────────────────
+# ⚙️ Generation settings
+# ──────────────────────────────────────────────
+CHAT_MODEL = "gpt-4o-mini"
+TEMPERATURE = 0.7
+DEADLINE_SECONDS = 8.0        # total budget per answer, hedges included
+HEDGE_DELAY = 2.5             # before enough latencies are seen to estimate the p95
+HEDGE_QUANTILE = 95
+HEDGE_MIN_DELAY = 0.5
+MIN_SAMPLES = 20              # successful calls needed before trusting the p95
+LATENCY_WINDOW = 200          # recent successful call latencies kept for the p95
+MAX_CONCURRENT_ANSWERS = 16   # answers in flight across all sessions the pool is sized for
+MAX_WORKERS = 2 * MAX_CONCURRENT_ANSWERS   # a primary and a hedge each
+RESULTS_METRIC = "llm_results_total"   # labels: source = primary / hedge / fallback
+
+
+def template_answer(query: str, docs: List[dict], n: int = 3) -> str:
+    """Instant recommendation built from the retrieved metadata alone (no model call)."""
+    if not docs:
+        return "No matching products to compare yet."
+
+    def describe(item):
+        details = [f"{item['price']}" if item.get("price") else None,
+                   f"rated {item['rating']}" if item.get("rating") else None]
+        details = ", ".join(d for d in details if d)
+        return f"<b>{html.escape(item['title'])}</b>" + (f" ({html.escape(details)})" if details else "")
+
+    best, others = docs[0], docs[1:n]
+    text = f"For “{html.escape(query)}”, the closest match is {describe(best)}."
+    if best.get("summary"):
+        text += f" {html.escape(best['summary'].split('. ')[0].rstrip('.'))}."
+    if others:
+        text += " Also worth a look: " + "; ".join(describe(item) for item in others) + "."
+    return text
+
+
+class Generator:
+    """Chat completions with a deadline and one hedged duplicate request.
+
+    The first attempt starts at once. If it hasn't answered by the observed p95
+    latency (or fails early), a duplicate is raced against it and the first answer
+    wins. Every attempt carries the deadline left *when it starts* as its HTTP timeout
+    and no client retries, so nothing outlives the budget, and an attempt that waited
+    out its budget in the queue is dropped unsent. No hedge is sent while every worker
+    is busy: it would only queue behind the calls it is meant to race. ``complete``
+    returns None when the deadline passes. Thread-safe; share one per process.
+    """
+
+    def __init__(self, client=None, model: str = CHAT_MODEL, deadline: float = DEADLINE_SECONDS,
+                 hedge: bool = True, temperature: float = TEMPERATURE, max_workers: int = MAX_WORKERS):
+        self._client = client
+        self.model = model
+        self.deadline = deadline
+        self.hedge = hedge
+        self.temperature = temperature
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self.max_workers = max_workers
+        self._in_flight = 0   # submitted attempts not finished yet (queued or running)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+
+    @property
+    def client(self):
+        if self._client is None:
+            from faiss_index import get_client
+            self._client = get_client()
+        return self._client
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the first attempt before racing a duplicate."""
+        with self._lock:
+            samples = list(self._latencies)
+        delay = float(np.percentile(samples, HEDGE_QUANTILE)) if len(samples) >= MIN_SAMPLES else HEDGE_DELAY
+        return min(max(delay, HEDGE_MIN_DELAY), self.deadline)
+
+    def _call(self, prompt: str, end: float):
+        start = time.perf_counter()
+        if end - start <= 0:
+            raise TimeoutError("deadline passed while queued")
+        response = self.client.with_options(timeout=end - start, max_retries=0).chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=self.temperature,
+        )
+        seconds = time.perf_counter() - start
+        telemetry.record("llm_attempt", seconds)
+        with self._lock:
+            self._latencies.append(seconds)
+        return response.choices[0].message.content.strip()
+
+    def _submit(self, prompt: str, end: float):
+        with self._lock:
+            self._in_flight += 1
+        future = self._executor.submit(self._call, prompt, end)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+
+    def saturated(self) -> bool:
+        """True while every worker is taken, i.e. a new attempt would have to queue."""
+        with self._lock:
+            return self._in_flight >= self.max_workers
+
+    def complete(self, prompt: str, deadline: float = None):
+        """(text or None, info); info has ``source`` (primary / hedge / None), ``attempts``, ``errors``
+        and ``hedge_skipped`` (a hedge was due but the pool was saturated)."""
+        start = time.perf_counter()
+        end = start + (self.deadline if deadline is None else deadline)
+        pending = {self._submit(prompt, end): "primary"}
+        hedge_at = start + self.hedge_delay() if self.hedge else None
+        info = {"source": None, "attempts": 1, "errors": [], "hedge_skipped": False}
+
+        while pending:
+            now = time.perf_counter()
+            wake = end if hedge_at is None else min(end, hedge_at)
+            done, _ = wait(pending, timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                source = pending.pop(future)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    info["errors"].append(f"{source}: {e}")
+                    continue
+                info["source"] = source
+                return text, info
+
+            now = time.perf_counter()
+            if now >= end:
+                break
+            if hedge_at is not None and (now >= hedge_at or not pending):
+                # Slower than the p95 so far (or already failed): race a duplicate, if a worker is free
+                if self.saturated():
+                    info["hedge_skipped"] = True
+                else:
+                    pending[self._submit(prompt, end)] = "hedge"
+                    info["attempts"] += 1
+                hedge_at = None
+        return None, info
+
+    def generate(self, prompt: str, query: str, docs: List[dict], deadline: float = None):
+        """(text, info): the model's answer, or template_answer() once the deadline passes."""
+        start = time.perf_counter()
+        text, info = self.complete(prompt, deadline)
+        if text is None:
+            text, info["source"] = template_answer(query, docs), "fallback"
+        info["latency_ms"] = (time.perf_counter() - start) * 1000
+        telemetry.count(RESULTS_METRIC, source=info["source"])
+        return text, info
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import argparse
+
+from attributes import ATTRIBUTES_FILE
+from faiss_index import EMBEDDING_MODEL, FAISS_INDEX_FILE, METADATA_FILE, index_version, save_index
+from passages import PASSAGE_INDEX_FILE, PASSAGE_MAP_FILE, save_passages
+
+# ──────────────────────────────────────────────
+# ⚙️ Release layout
+# ──────────────────────────────────────────────
+# index_releases/<release>/{product_faiss.index, product_metadata.json, product_attributes.npz, manifest.json}
+#                           (+ passages.index, passage_products.npy when built with --passages)
+# index_releases/current -> <release>   (symlink, swapped atomically on publish / rollback)
+RELEASES_DIR = "index_releases"
+CURRENT_LINK = "current"
+MANIFEST_FILE = "manifest.json"
+RELEASE_FILES = (FAISS_INDEX_FILE, METADATA_FILE, ATTRIBUTES_FILE)
+KEEP_RELEASES = 5          # older releases are pruned after each publish
+CHECKSUM_CHUNK = 1 << 20
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def current_release(releases_dir: str = RELEASES_DIR):
+    """Name of the live release, or None when nothing has been published yet."""
+    link = os.path.join(releases_dir, CURRENT_LINK)
+    return os.readlink(link) if os.path.islink(link) else None
+
+
+def locate(release: str = None, releases_dir: str = RELEASES_DIR):
+    """(version, directory) of ``release`` or the live one.
+
+    Without any published release this falls back to the loose files in the working
+    directory (the pre-release layout), versioned by their size + mtime as before
+    (None when those don't exist either).
+    Resolve once and read every file from the returned directory: a publish only
+    swaps the pointer, so that directory never changes underneath the reader.
+    """
+    release = release or current_release(releases_dir)
+    if release is None:
+        if not (os.path.exists(FAISS_INDEX_FILE) and os.path.exists(METADATA_FILE)):
+            return None, "."
+        return index_version(FAISS_INDEX_FILE, METADATA_FILE), "."
+    return release, os.path.join(releases_dir, release)
+
+
+def resolve_files(index_file: str = None, metadata_file: str = None):
+    """(version, index_file, metadata_file): explicit paths as given, else the live release's.
+
+    Give both paths or neither; one on its own would silently pair with the other file
+    of the live release.
+    """
+    if bool(index_file) != bool(metadata_file):
+        raise ValueError("--index and --metadata must be given together (or neither, for the live release)")
+    if index_file and metadata_file:
+        return index_version(index_file, metadata_file), index_file, metadata_file
+    version, directory = locate()
+    return version, os.path.join(directory, FAISS_INDEX_FILE), os.path.join(directory, METADATA_FILE)
+
+
+def load_manifest(directory: str):
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def validate(directory: str, verify_checksums: bool = True):
+    """Check a release's files against its manifest; raises ValueError on the first mismatch.
+
+    File sizes are always checked, SHA-256 checksums when ``verify_checksums``, and the
+    embedding model against the one queries are embedded with. Returns the manifest,
+    or None for the manifest-less loose layout.
+    """
+    manifest = load_manifest(directory)
+    if manifest is None:
+        return None
+    for name, expected in manifest["files"].items():
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            raise ValueError(f"{path} is missing")
+        if os.path.getsize(path) != expected["bytes"]:
+            raise ValueError(f"{path} is {os.path.getsize(path)} bytes, manifest says {expected['bytes']}")
+        if verify_checksums and _sha256(path) != expected["sha256"]:
+            raise ValueError(f"{path} does not match its manifest checksum")
+    if manifest["embedding_model"] != EMBEDDING_MODEL:
+        raise ValueError(f"release was embedded with {manifest['embedding_model']}, queries use {EMBEDDING_MODEL}")
+    return manifest
+
+
+def check_loaded(manifest, index, metadata, passage_index=None):
+    """Check a loaded index + metadata (+ passages) against the manifest's counts and dimension."""
+    if manifest is None:
+        return
+    if index.ntotal != manifest["count"] or len(metadata) != manifest["count"]:
+        raise ValueError(f"index holds {index.ntotal} vectors and metadata {len(metadata)} products, "
+                         f"manifest says {manifest['count']}")
+    if index.d != manifest["dim"]:
+        raise ValueError(f"index dimension {index.d}, manifest says {manifest['dim']}")
+    if passage_index is not None:
+        if passage_index.index.ntotal != manifest.get("passages") or len(passage_index.products) != manifest["passages"]:
+            raise ValueError(f"passage index holds {passage_index.index.ntotal} vectors, "
+                             f"manifest says {manifest.get('passages')}")
+        if passage_index.n_products > manifest["count"]:
+            raise ValueError("passage map points past the last product")
+
+
+def _point_to(release: str, releases_dir: str):
+    """Atomically repoint ``current`` (symlink + rename; readers see the old or the new release)."""
+    tmp = os.path.join(releases_dir, CURRENT_LINK + ".tmp")
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    os.symlink(release, tmp)  # relative target, so the releases dir can be moved as a whole
+    os.replace(tmp, os.path.join(releases_dir, CURRENT_LINK))
+
+
+def list_releases(releases_dir: str = RELEASES_DIR):
+    """Published release names, oldest first (names start with their UTC timestamp)."""
+    if not os.path.isdir(releases_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(releases_dir)
+        if not name.startswith(".") and name != CURRENT_LINK
+        and os.path.exists(os.path.join(releases_dir, name, MANIFEST_FILE))
+    )
+
+
+def prune(releases_dir: str = RELEASES_DIR, keep: int = KEEP_RELEASES):
+    """Delete all but the newest ``keep`` releases, never the live one or its rollback target."""
+    current = current_release(releases_dir)
+    manifest = load_manifest(os.path.join(releases_dir, current)) if current else None
+    protected = {current, manifest and manifest.get("previous")}
+    for name in list_releases(releases_dir)[:-keep]:
+        if name not in protected:
+            shutil.rmtree(os.path.join(releases_dir, name), ignore_errors=True)
+
+
+def publish(index, metadata, releases_dir: str = RELEASES_DIR, keep: int = KEEP_RELEASES,
+            passages=None) -> str:
+    """Write a new release directory with its manifest, then make it live; returns its name.
+
+    Everything is written under a hidden staging name and renamed into place before
+    the pointer moves, so a reader can only ever resolve a complete release.
+    ``passages`` = (passage index, passage→product ids) adds the multi-vector files.
+    """
+    if index.ntotal != len(metadata):
+        raise ValueError(f"refusing to publish {index.ntotal} vectors with {len(metadata)} metadata rows")
+    os.makedirs(releases_dir, exist_ok=True)
+    now = time.time()
+    release = f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime(now))}.{int(now % 1 * 1000):03d}-{uuid.uuid4().hex[:6]}"
+    staging = os.path.join(releases_dir, f".{release}.tmp")
+    os.makedirs(staging)
+
+    paths = {name: os.path.join(staging, name) for name in RELEASE_FILES}
+    save_index(index, metadata, paths[FAISS_INDEX_FILE], paths[METADATA_FILE], paths[ATTRIBUTES_FILE])
+    if passages is not None:
+        save_passages(*passages, staging)
+        paths.update({name: os.path.join(staging, name) for name in (PASSAGE_INDEX_FILE, PASSAGE_MAP_FILE)})
+    manifest = {
+        "release": release,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "count": index.ntotal,
+        "dim": index.d,
+        "passages": passages[0].ntotal if passages is not None else None,
+        "embedding_model": EMBEDDING_MODEL,
+        "previous": current_release(releases_dir),
+        "files": {name: {"bytes": os.path.getsize(path), "sha256": _sha256(path)} for name, path in paths.items()},
+    }
+    with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    os.replace(staging, os.path.join(releases_dir, release))
+    _point_to(release, releases_dir)
+    prune(releases_dir, keep)
+    return release
+
+
+def rollback(to: str = None, releases_dir: str = RELEASES_DIR, verify_checksums: bool = False) -> str:
+    """Point ``current`` back at the previous release (or ``to``); returns the release now live.
+
+    Only a pointer moves, so this is instant; the app picks it up on its next rerun.
+    Sizes are checked first (checksums too with ``verify_checksums``).
+    """
+    current = current_release(releases_dir)
+    if to is None:
+        manifest = load_manifest(os.path.join(releases_dir, current)) if current else None
+        to = manifest and manifest.get("previous")
+        if not to:
+            raise ValueError("no previous release to roll back to")
+    directory = os.path.join(releases_dir, to)
+    if not os.path.isdir(directory):
+        raise ValueError(f"release {to} not found in {releases_dir}")
+    validate(directory, verify_checksums=verify_checksums)
+    _point_to(to, releases_dir)
+    return to
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect, verify and roll back published index releases")
+    parser.add_argument("--releases-dir", default=RELEASES_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Show releases, newest last (* = live)")
+    verify_cmd = commands.add_parser("verify", help="Check a release's files against its manifest checksums")
+    verify_cmd.add_argument("release", nargs="?", help="Defaults to the live release")
+    rollback_cmd = commands.add_parser("rollback", help="Switch back to the previous (or a given) release")
+    rollback_cmd.add_argument("--to", help="Release name to make live")
+    rollback_cmd.add_argument("--verify", action="store_true", help="Verify checksums before switching")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        current = current_release(args.releases_dir)
+        for name in list_releases(args.releases_dir):
+            m = load_manifest(os.path.join(args.releases_dir, name))
+            passages = f"  {m['passages']} passages" if m.get("passages") else ""
+            print(f"{'*' if name == current else ' '} {name}  {m['count']:>8} products{passages}  dim {m['dim']}  "
+                  f"{m['embedding_model']}  {m['created_at']}")
+    elif args.command == "verify":
+        release = args.release or current_release(args.releases_dir)
+        if release is None:
+            raise SystemExit("❌ No release published yet")
+        validate(os.path.join(args.releases_dir, release))
+        print(f"✅ {release} matches its manifest")
+    else:
+        release = rollback(args.to, args.releases_dir, args.verify)
+        print(f"⏪ {release} is live again; rerun precompute.py / similar_items.py to refresh their caches")
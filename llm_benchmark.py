@@ -0,0 +1,154 @@
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import generation
+
+# ──────────────────────────────────────────────
+# ⚙️ Benchmark defaults
+# ──────────────────────────────────────────────
+DEFAULT_REQUESTS = 200
+MEDIAN_SECONDS = 0.4          # fake server: typical completion time
+JITTER = 0.3                  # lognormal sigma around the median
+TAIL_PROB = 0.05              # share of requests that stall
+TAIL_SECONDS = 6.0            # extra delay of a stalled request
+ERROR_PROB = 0.01             # share of requests answered with a 500
+RESULTS_FILE = "llm_benchmark_results.json"
+STRATEGIES = ("single", "deadline", "hedged")
+SAMPLE_DOCS = [
+    {"title": "Example Laptop 14", "price": "$899", "rating": "4.5", "summary": "Light and quiet. Good battery."},
+    {"title": "Example Laptop 16", "price": "$1,199", "rating": "4.3"},
+]
+
+
+class _FakeChatHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible /v1/chat/completions with a heavy-tailed latency distribution."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        with server.lock:
+            if server.script:
+                delay, fail = server.script.pop(0)
+            else:
+                delay = server.rng.lognormvariate(0, server.jitter) * server.median
+                if server.rng.random() < server.tail_prob:
+                    delay += server.tail_seconds
+                fail = server.rng.random() < server.error_prob
+        time.sleep(delay)
+        try:
+            self._respond(fail)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up on this attempt (deadline or a faster hedge)
+
+    def _respond(self, fail: bool):
+        if fail:
+            self.send_error(500)
+            return
+        body = json.dumps({
+            "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": "fake",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "Fake recommendation."},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_fake_openai(port: int = 0, median: float = MEDIAN_SECONDS, jitter: float = JITTER,
+                      tail_prob: float = TAIL_PROB, tail_seconds: float = TAIL_SECONDS,
+                      error_prob: float = ERROR_PROB, seed: int = 0, script=None) -> ThreadingHTTPServer:
+    """Start the fake server on a background thread; base URL is http://127.0.0.1:<port>/v1.
+
+    ``script`` is a list of (delay seconds, fail) served to the first requests in arrival
+    order before the random distribution takes over (for tests).
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), _FakeChatHandler)
+    server.daemon_threads = True
+    server.rng, server.lock = random.Random(seed), threading.Lock()
+    server.median, server.jitter, server.tail_prob = median, jitter, tail_prob
+    server.tail_seconds, server.error_prob = tail_seconds, error_prob
+    server.script = list(script or [])
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_generator(strategy: str, client, deadline: float) -> generation.Generator:
+    if strategy == "single":
+        # The old behaviour: wait as long as it takes (bounded only to keep the run finite)
+        return generation.Generator(client, hedge=False, deadline=10 * deadline)
+    return generation.Generator(client, hedge=strategy == "hedged", deadline=deadline)
+
+
+def bench_strategy(strategy: str, client, requests: int, deadline: float) -> dict:
+    generator = make_generator(strategy, client, deadline)
+    latencies, sources, attempts = [], [], 0
+    for _ in range(requests):
+        _, info = generator.generate("Recommend one of these.", "quiet laptop", SAMPLE_DOCS)
+        latencies.append(info["latency_ms"])
+        sources.append(info["source"])
+        attempts += info["attempts"]
+    lat = np.asarray(latencies)
+    return {
+        "requests": requests,
+        "latency_ms": {"p50": float(np.percentile(lat, 50)), "p95": float(np.percentile(lat, 95)),
+                       "p99": float(np.percentile(lat, 99)), "max": float(lat.max())},
+        "fallback_rate": sources.count("fallback") / requests,
+        "hedge_wins": sources.count("hedge"),
+        "extra_calls": attempts / requests - 1,   # load added by hedging
+        "final_hedge_delay_ms": 1000 * generator.hedge_delay() if strategy == "hedged" else None,
+    }
+
+
+def run_benchmark(base_url: str, requests: int = DEFAULT_REQUESTS, deadline: float = generation.DEADLINE_SECONDS,
+                  strategies=STRATEGIES) -> dict:
+    from openai import OpenAI
+    client = OpenAI(api_key="sk-benchmark", base_url=base_url)
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "base_url": base_url,
+              "deadline_seconds": deadline, "strategies": {}}
+    for strategy in strategies:
+        result = bench_strategy(strategy, client, requests, deadline)
+        report["strategies"][strategy] = result
+        lat = result["latency_ms"]
+        print(f"⏱️ {strategy:<8} p50 {lat['p50']:7.0f}ms  p95 {lat['p95']:7.0f}ms  p99 {lat['p99']:7.0f}ms  "
+              f"max {lat['max']:7.0f}ms  fallback {result['fallback_rate']:.1%}  "
+              f"hedge wins {result['hedge_wins']}  extra calls {result['extra_calls']:+.1%}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tail latency of LLM answers: single call vs deadline vs hedged")
+    parser.add_argument("--url", help="OpenAI-compatible base URL (default: start a local fake server)")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS)
+    parser.add_argument("--deadline", type=float, default=generation.DEADLINE_SECONDS)
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--median", type=float, default=MEDIAN_SECONDS, help="Fake server median latency (s)")
+    parser.add_argument("--tail-prob", type=float, default=TAIL_PROB)
+    parser.add_argument("--tail-seconds", type=float, default=TAIL_SECONDS)
+    parser.add_argument("--error-prob", type=float, default=ERROR_PROB)
+    parser.add_argument("--output", default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    base_url = args.url
+    if base_url is None:
+        server = serve_fake_openai(median=args.median, tail_prob=args.tail_prob,
+                                   tail_seconds=args.tail_seconds, error_prob=args.error_prob)
+        base_url = f"http://127.0.0.1:{server.server_port}/v1"
+        print(f"🧪 Fake OpenAI server at {base_url} (median {args.median}s, "
+              f"{args.tail_prob:.0%} stall +{args.tail_seconds}s, {args.error_prob:.0%} errors)")
+
+    report = run_benchmark(base_url, args.requests, args.deadline, args.strategies.split(","))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results saved to {args.output}")
@@ -0,0 +1,118 @@
+import base64
+import io
+import json
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+
+from scrape_store import SEGMENT_SUFFIX, compress_frame, open_frames, segment_suffix
+
+# Raw fetched pages, one compressed frame per flushed batch (same framing as scrape segments)
+PAGE_ARCHIVE_FILE = "page_archive" + SEGMENT_SUFFIX
+FLUSH_PAGES = 50
+
+# Describe the original transfer, not the decoded body we stored
+REPLAY_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class PageArchive:
+    """Append-only archive of fetched responses (URL, status, headers, body) for offline replay.
+
+    The crawler records into it with ``--record``; profiling and benchmarks read it back
+    instead of touching the network. Error and non-HTML responses are kept too (with
+    an empty body), and so are search results per prompt, so a whole crawl can be
+    replayed. Later records for the same URL or prompt win on read.
+    """
+
+    def __init__(self, path: str = PAGE_ARCHIVE_FILE, flush_every: int = FLUSH_PAGES):
+        self.path = path
+        self.flush_every = flush_every
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def add(self, url: str, status_code: int, headers: dict, body: bytes, final_url: str = None):
+        record = {
+            "kind": "page",
+            "url": url,
+            "final_url": final_url or url,
+            "status": status_code,
+            "headers": dict(headers),
+            "body": base64.b64encode(body).decode("ascii"),
+        }
+        self._append(record)
+
+    def add_search(self, prompt: str, links: list):
+        self._append({"kind": "search", "prompt": prompt, "links": links})
+
+    def _append(self, record: dict):
+        with self._lock:
+            self._buffer.append(record)
+            if len(self._buffer) >= self.flush_every:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        payload = "".join(json.dumps(r) + "\n" for r in self._buffer).encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(compress_frame(payload, segment_suffix(self.path)))
+        self._buffer.clear()
+
+    def load(self):
+        """Return ({url: page record with ``body`` as bytes}, {prompt: search links})."""
+        pages, searches = {}, {}
+        if not os.path.exists(self.path):
+            return pages, searches
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        for line in open_frames(raw, segment_suffix(self.path)):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("kind") == "search":
+                searches[record["prompt"]] = record["links"]
+            else:
+                record["body"] = base64.b64decode(record["body"])
+                pages[record["url"]] = record
+        return pages, searches
+
+    def pages(self) -> dict:
+        return self.load()[0]
+
+
+def parseable_pages(pages: dict) -> list:
+    """Archived pages worth parsing: the HTML ones (error and skipped responses have no body)."""
+    return [p for p in pages.values() if p["status"] < 400 and p["body"]]
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Transport adapter answering every request from archived pages (404 when missing).
+
+    Mount it on a session and the normal request path runs unchanged (streaming,
+    header handling, decoding) with no network involved.
+    """
+
+    def __init__(self, pages: dict):
+        super().__init__()
+        # Key by the prepared URL so requests' own normalisation matches on lookup
+        self.pages = {requests.Request("GET", url).prepare().url: record for url, record in pages.items()}
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        record = self.pages.get(request.url)
+        if record is None:
+            status, headers, body, final_url = 404, {"Content-Type": "text/html"}, b"", request.url
+        else:
+            headers = {k: v for k, v in record["headers"].items() if k.lower() not in REPLAY_DROP_HEADERS}
+            status, body, final_url = record["status"], record["body"], record["final_url"]
+        raw = HTTPResponse(body=io.BytesIO(body), headers=headers, status=status,
+                           preload_content=False, decode_content=False)
+        response = self.build_response(request, raw)
+        response.url = final_url
+        return response
@@ -0,0 +1,138 @@
+import os
+from typing import List, Optional
+
+import numpy as np
+from tqdm import tqdm
+
+from faiss_index import BATCH_SIZE, embed_texts, product_metadata
+from retrieval import search_params
+
+# ──────────────────────────────────────────────
+# ⚙️ Passage (multi-vector) settings
+# ──────────────────────────────────────────────
+PASSAGE_INDEX_FILE = "passages.index"
+PASSAGE_MAP_FILE = "passage_products.npy"    # row i = product id of passage i (int32)
+PASSAGE_WORDS = 120       # words per passage
+PASSAGE_OVERLAP = 30      # words shared by consecutive passages
+MAX_PASSAGES = 8          # per product; bounds embedding cost for very long pages
+PASSAGE_OVERFETCH = 4     # passage hits fetched per product requested
+AGGREGATIONS = ("max", "sum")
+
+
+def split_passages(text: str, words: int = PASSAGE_WORDS, overlap: int = PASSAGE_OVERLAP,
+                   limit: int = MAX_PASSAGES) -> List[str]:
+    """Overlapping word windows over ``text`` (at most ``limit``)."""
+    tokens = text.split()
+    step = max(1, words - overlap)
+    starts = range(0, max(1, len(tokens) - overlap), step)
+    return [" ".join(tokens[s:s + words]) for s in starts][:limit] if tokens else []
+
+
+def passage_text(product: dict, passage: str) -> str:
+    """The title rides along with every passage so each one stays attributable on its own."""
+    return f"{product['title']}\n{passage}"
+
+
+def embed_products(products: List[dict], embed_fn=embed_texts, batch_size: int = BATCH_SIZE):
+    """Embed every product's passages in batches.
+
+    Returns (metadata, product_vectors, passage_vectors, passage_products). A product
+    is dropped if any of its passages failed to embed. Its product-level vector is
+    the normalized mean of its passages, so the rest of the app (MMR, similar items,
+    category centroids) keeps working without a second embedding per product.
+    """
+    texts, owners = [], []
+    for i, product in enumerate(products):
+        for passage in split_passages(product.get("full_text", "")) or [product.get("summary") or ""]:
+            texts.append(passage_text(product, passage))
+            owners.append(i)
+    owners = np.asarray(owners, dtype=np.int64)
+    print(f"✂️ {len(texts)} passages from {len(products)} products")
+
+    vectors, failed = [None] * len(texts), np.zeros(len(products), dtype=bool)
+    for start in tqdm(range(0, len(texts), batch_size), desc="Embedding passages"):
+        end = min(start + batch_size, len(texts))
+        try:
+            vectors[start:end] = embed_fn(texts[start:end])
+        except Exception as e:
+            print(f"❌ Batch failed: {e}")
+            failed[owners[start:end]] = True
+
+    kept = np.flatnonzero(~failed)
+    if len(kept) == 0:
+        return [], None, None, None
+    new_ids = np.full(len(products), -1, dtype=np.int64)
+    new_ids[kept] = np.arange(len(kept))
+    keep = ~failed[owners]
+    passage_vectors = np.asarray([v for v, k in zip(vectors, keep) if k], dtype="float32")
+    passage_products = new_ids[owners[keep]]
+
+    sums = np.zeros((len(kept), passage_vectors.shape[1]), dtype="float32")
+    np.add.at(sums, passage_products, passage_vectors)
+    product_vectors = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    metadata = [product_metadata(products[i]) for i in kept]
+    return metadata, product_vectors, passage_vectors, passage_products.astype(np.int32)
+
+
+def save_passages(index, passage_products: np.ndarray, directory: str):
+    import faiss
+    faiss.write_index(index, os.path.join(directory, PASSAGE_INDEX_FILE))
+    np.save(os.path.join(directory, PASSAGE_MAP_FILE), passage_products.astype(np.int32))
+
+
+def load_passages(directory: str, aggregate: str = "max") -> Optional["PassageIndex"]:
+    """The release's passage index, or None when it was built without passages."""
+    index_path = os.path.join(directory, PASSAGE_INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None
+    import faiss
+    return PassageIndex(faiss.read_index(index_path), np.load(os.path.join(directory, PASSAGE_MAP_FILE)), aggregate)
+
+
+class PassageIndex:
+    """Passage vectors plus their product ids; searches return products, not passages."""
+
+    def __init__(self, index, passage_products: np.ndarray, aggregate: str = "max"):
+        if aggregate not in AGGREGATIONS:
+            raise ValueError(f"aggregate must be one of {AGGREGATIONS}")
+        self.index = index
+        self.products = np.asarray(passage_products, dtype=np.int64)
+        self.aggregate = aggregate
+        self.n_products = int(self.products.max()) + 1 if len(self.products) else 0
+
+    def search(self, query_vectors: np.ndarray, k: int, allowed_ids: Optional[np.ndarray] = None):
+        """Top-``k`` products per query row by passage score: (ids int64 [q, k], scores [q, k]).
+
+        ``max`` scores a product by its best passage, ``sum`` by the total similarity of
+        its passages among the hits (rewarding pages that match throughout). Padding
+        is -1 / -inf. Aggregation runs over the whole batch at once, no Python loop.
+        """
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype="float32"))
+        q = len(queries)
+        allowed = None if allowed_ids is None else np.flatnonzero(np.isin(self.products, allowed_ids))
+        pool = self.index.ntotal if allowed is None else len(allowed)
+        m = min(pool, k * PASSAGE_OVERFETCH)
+        if m == 0 or k == 0:
+            return np.full((q, k), -1, dtype=np.int64), np.full((q, k), -np.inf, dtype="float32")
+        D, I = self.index.search(queries, m, params=search_params(allowed))
+
+        owners = np.where(I >= 0, self.products[np.maximum(I, 0)], -1)
+        sims = 1.0 - D / 2.0      # cosine similarity for unit-length embeddings
+        # One key per (query row, product); np.unique's first index is the best hit (rows are sorted)
+        keys = (np.arange(q)[:, None] * (self.n_products + 1) + owners + 1).ravel()
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        scores = np.full(q * m, -np.inf, dtype="float32")
+        if self.aggregate == "max":
+            scores[first] = sims.ravel()[first]
+        else:
+            scores[first] = np.bincount(inverse.ravel(), weights=sims.ravel())
+        scores = np.where(owners.ravel() >= 0, scores, -np.inf).reshape(q, m)
+
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        top_scores = np.take_along_axis(scores, order, axis=1)
+        top_ids = np.where(np.isfinite(top_scores), np.take_along_axis(owners, order, axis=1), -1)
+        if top_ids.shape[1] < k:
+            pad = k - top_ids.shape[1]
+            top_ids = np.pad(top_ids, ((0, 0), (0, pad)), constant_values=-1)
+            top_scores = np.pad(top_scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+        return top_ids, top_scores
@@ -0,0 +1,58 @@
+from typing import Optional
+
+import numpy as np
+
+# ──────────────────────────────────────────────
+# ⚙️ Session personalization settings
+# ──────────────────────────────────────────────
+HISTORY_LIMIT = 20        # queries kept in st.session_state["history"]
+PROFILE_DECAY = 0.7       # weight left on the profile after each new event
+QUERY_WEIGHT = 1.0
+CLICK_WEIGHT = 2.0        # a liked product says more than a typed query
+MIN_EVENTS = 2            # don't personalize off a single search
+
+
+class SessionProfile:
+    """Exponentially decayed mean of a session's query and liked-product embeddings.
+
+    Only a running weighted sum and its total weight are kept, so memory stays at
+    one vector however long the session runs. Vectors come from caches the app
+    already has (query embeddings, index reconstruct), never from the API.
+    """
+
+    def __init__(self, decay: float = PROFILE_DECAY):
+        self.decay = decay
+        self._sum = None
+        self._weight = 0.0
+        self.queries = 0
+        self.clicks = 0
+
+    def _add(self, vector: np.ndarray, weight: float):
+        vector = np.asarray(vector, dtype="float32")
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return
+        vector = vector / norm
+        if self._sum is None or self._sum.shape != vector.shape:
+            self._sum, self._weight = np.zeros_like(vector), 0.0
+        self._sum = self.decay * self._sum + weight * vector
+        self._weight = self.decay * self._weight + weight
+
+    def add_query(self, vector: np.ndarray):
+        self._add(vector, QUERY_WEIGHT)
+        self.queries += 1
+
+    def add_click(self, vector: np.ndarray):
+        self._add(vector, CLICK_WEIGHT)
+        self.clicks += 1
+
+    def vector(self) -> Optional[np.ndarray]:
+        """Unit-length preference vector, or None until there is enough history."""
+        if self._sum is None or self.queries + self.clicks < MIN_EVENTS:
+            return None
+        mean = self._sum / self._weight
+        norm = np.linalg.norm(mean)
+        return mean / norm if norm > 0 else None
+
+    def reset(self):
+        self.__init__(self.decay)
@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+
+import faiss
+import numpy as np
+
+import telemetry
+from dedupe import NearDuplicateIndex
+from faiss_index import BATCH_SIZE, FAISS_INDEX_FILE, METADATA_FILE, embed_texts, product_text, product_metadata
+from index_release import RELEASES_DIR, locate, publish
+from prompt_feeder import get_prompts_by_category
+from similar_items import build_and_save as build_similar_graph
+
+# ──────────────────────────────────────────────
+# ⚙️ Pipeline settings
+# ──────────────────────────────────────────────
+QUEUE_SIZE = 256          # bound between stages; a full queue blocks the stage upstream
+BATCH_WAIT = 5.0          # max seconds the embed stage waits to fill a batch
+FLUSH_INTERVAL = 30.0     # seconds between index publishes
+REPORT_INTERVAL = 10.0
+
+_DONE = object()          # end-of-stream marker passed down the queues
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.busy = 0.0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, items_in: int, items_out: int, seconds: float):
+        with self._lock:
+            self.items_in += items_in
+            self.items_out += items_out
+            self.busy += seconds
+        telemetry.record(f"pipeline_{self.name}", seconds)
+
+    def line(self, q: queue.Queue = None) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        depth = f" | queue {q.qsize()}/{q.maxsize}" if q is not None else ""
+        return (f"{self.name:<7} in {self.items_in:>6}  out {self.items_out:>6}  "
+                f"{self.items_out / elapsed:7.2f}/s  busy {100 * self.busy / elapsed:5.1f}%{depth}")
+
+
+class Pipeline:
+    """Crawl → dedupe → embed → index, connected by bounded queues.
+
+    Each stage runs in its own thread(s). Bounded queues give backpressure: a slow
+    embedding API stalls dedupe, which stalls the crawlers, instead of buffering the
+    whole crawl in memory. The index stage republishes the index every
+    ``flush_interval`` seconds as a new release, and app.py switches to it on its next rerun.
+    """
+
+    def __init__(self, prompt_map: dict, crawl_workers: int = 2, queue_size: int = QUEUE_SIZE,
+                 batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL,
+                 releases_dir: str = RELEASES_DIR, scrape_fn=None, embed_fn=embed_texts):
+        if scrape_fn is None:
+            from scrape_results import run_scraper_for_prompt as scrape_fn
+        self.jobs = [(category, prompt) for category, prompts in prompt_map.items() for prompt in prompts]
+        self.crawl_workers = crawl_workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.releases_dir = releases_dir
+        self.release = None
+        self.scrape_fn = scrape_fn
+        self.embed_fn = embed_fn
+
+        self.raw_q = queue.Queue(maxsize=queue_size)
+        self.unique_q = queue.Queue(maxsize=queue_size)
+        self.embedded_q = queue.Queue(maxsize=max(1, queue_size // batch_size))
+
+        self.stats = {name: StageStats(name) for name in ("crawl", "dedupe", "embed", "index")}
+        self.index, self.metadata = self._load_existing()
+        self.duplicates = NearDuplicateIndex()
+        self._duplicates_lock = threading.Lock()  # checked by the dedupe stage, released by embed on failure
+        for m in self.metadata:
+            self.duplicates.check({"url": m["url"]})  # URL-only: texts are not kept in metadata
+        self._finished = threading.Event()
+
+    def _load_existing(self):
+        _, directory = locate(releases_dir=self.releases_dir)
+        index_file, metadata_file = os.path.join(directory, FAISS_INDEX_FILE), os.path.join(directory, METADATA_FILE)
+        if os.path.exists(index_file) and os.path.exists(metadata_file):
+            index = faiss.read_index(index_file)
+            with open(metadata_file, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            if index.ntotal == len(metadata):
+                print(f"📂 Continuing from existing index ({index.ntotal} products)")
+                return index, metadata
+            print("⚠️ Existing index and metadata disagree; starting a fresh index")
+        return None, []
+
+    # ── stages ─────────────────────────────────
+    def _crawl_worker(self, jobs: queue.Queue):
+        while True:
+            try:
+                category, prompt = jobs.get_nowait()
+            except queue.Empty:
+                return
+            start = time.perf_counter()
+            products = self.scrape_fn(prompt, category) or []
+            self.stats["crawl"].record(1, len(products), time.perf_counter() - start)
+            for product in products:
+                product["category"] = category
+                self.raw_q.put(product)  # blocks while downstream is behind
+
+    def _crawl(self):
+        jobs = queue.Queue()
+        for job in self.jobs:
+            jobs.put(job)
+        workers = [threading.Thread(target=self._crawl_worker, args=(jobs,), daemon=True)
+                   for _ in range(self.crawl_workers)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        self.raw_q.put(_DONE)
+
+    def _dedupe(self):
+        while True:
+            product = self.raw_q.get()
+            if product is _DONE:
+                self.unique_q.put(_DONE)
+                return
+            start = time.perf_counter()
+            with self._duplicates_lock:
+                keep = bool(product.get("full_text") and product.get("title")) and self.duplicates.check(product)
+            self.stats["dedupe"].record(1, int(keep), time.perf_counter() - start)
+            if keep:
+                self.unique_q.put(product)
+
+    def _embed(self):
+        done = False
+        while not done:
+            batch = []
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    product = self.unique_q.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if product is _DONE:
+                    done = True
+                    break
+                batch.append(product)
+                if deadline is None:
+                    deadline = time.monotonic() + BATCH_WAIT
+
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                vectors = np.asarray(self.embed_fn([product_text(p) for p in batch]), dtype="float32")
+            except Exception as e:
+                print(f"❌ Batch failed: {e}")
+                self.stats["embed"].record(len(batch), 0, time.perf_counter() - start)
+                with self._duplicates_lock:
+                    for product in batch:
+                        self.duplicates.remove(product["url"])  # not indexed, so a later crawl may retry it
+                continue
+            self.stats["embed"].record(len(batch), len(batch), time.perf_counter() - start)
+            self.embedded_q.put((vectors, [product_metadata(p) for p in batch]))
+        self.embedded_q.put(_DONE)
+
+    def _index(self):
+        dirty = False
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self.embedded_q.get(timeout=1.0)
+            except queue.Empty:
+                item = None
+
+            if item is not None and item is not _DONE:
+                vectors, metas = item
+                start = time.perf_counter()
+                if self.index is None:
+                    self.index = faiss.IndexFlatL2(vectors.shape[1])
+                self.index.add(vectors)
+                self.metadata.extend(metas)
+                dirty = True
+                self.stats["index"].record(len(metas), len(metas), time.perf_counter() - start)
+
+            if dirty and (item is _DONE or time.monotonic() - last_flush >= self.flush_interval):
+                self.publish()
+                dirty = False
+                last_flush = time.monotonic()
+            if item is _DONE:
+                return
+
+    def publish(self):
+        with telemetry.span("pipeline_publish"):
+            self.release = publish(self.index, self.metadata, self.releases_dir)
+        print(f"📦 Published release {self.release} with {self.index.ntotal} products")
+
+    # ── driver ─────────────────────────────────
+    def report(self) -> str:
+        queues = {"crawl": self.raw_q, "dedupe": self.unique_q, "embed": self.embedded_q, "index": None}
+        return "\n".join(self.stats[name].line(q) for name, q in queues.items())
+
+    def _reporter(self):
+        while not self._finished.wait(REPORT_INTERVAL):
+            print(f"📊 Pipeline throughput\n{self.report()}")
+
+    def run(self):
+        threads = [threading.Thread(target=fn, daemon=True)
+                   for fn in (self._crawl, self._dedupe, self._embed, self._index)]
+        reporter = threading.Thread(target=self._reporter, daemon=True)
+        for t in threads:
+            t.start()
+        reporter.start()
+        for t in threads:
+            t.join()
+        self._finished.set()
+        print(f"✅ Pipeline finished\n{self.report()}")
+        if self.release is not None:
+            # All-pairs is too costly per flush; rebuild the similar-items graph once at the end
+            build_similar_graph(index=self.index, version=self.release)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream crawled products straight into the live FAISS index")
+    parser.add_argument("--category", action="append", help="Only crawl these categories (repeatable)")
+    parser.add_argument("--crawl-workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL)
+    parser.add_argument("--metrics-port", type=int, help="Expose Prometheus metrics on this port while running")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        telemetry.serve_metrics(args.metrics_port)
+
+    prompt_map = get_prompts_by_category()
+    if args.category:
+        prompt_map = {c: p for c, p in prompt_map.items() if c in args.category}
+
+    Pipeline(prompt_map, crawl_workers=args.crawl_workers, batch_size=args.batch_size,
+             flush_interval=args.flush_interval).run()
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from tqdm import tqdm
+
+import retrieval
+from faiss_index import BATCH_SIZE, embed_texts
+from generation import Generator
+from index_release import resolve_files
+from passages import load_passages
+from prompt_feeder import get_prompts_by_category
+from query_router import QueryRouter, normalize_query
+from rag_context import build_rag_prompt
+
+# Keyed store of precomputed rankings (and optional answers) for the prompt catalog
+PRECOMPUTED_FILE = "precomputed_results.json"
+# Prompt embeddings, row i = store["embedding_keys"][i]; reused across index rebuilds
+PROMPT_EMBEDDINGS_FILE = "prompt_embeddings.npy"
+
+PRECOMPUTED_TOP_K = 10    # the UI slider's maximum, so every setting can be served
+ANSWER_TOP_K = 5          # answers are written for the app's default result count
+ANSWER_WORKERS = 8
+ANSWER_DEADLINE = 60.0
+
+
+def load_store(path: str = PRECOMPUTED_FILE, version: str = None) -> dict:
+    """Load the store; returns an empty one when missing or built for another index version."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            store = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {"entries": {}}
+    if version is not None and store.get("index_version") != version:
+        return {"entries": {}}
+    return store
+
+
+def load_prompt_embeddings(store_path: str = PRECOMPUTED_FILE, path: str = PROMPT_EMBEDDINGS_FILE):
+    """(keys, vectors) of the cached prompt embeddings; they don't depend on the index version.
+
+    Empty (no keys, a 0-row array) until precompute.py has run, or if the two files disagree.
+    """
+    store = load_store(store_path)
+    keys = store.get("embedding_keys") or []
+    vectors = np.load(path) if keys and os.path.exists(path) else None
+    if vectors is None or len(vectors) != len(keys):
+        return [], np.empty((0, 0), dtype="float32")
+    return keys, vectors
+
+
+def embed_prompts(keys, prompts, path: str = PROMPT_EMBEDDINGS_FILE, previous_keys=None) -> np.ndarray:
+    """Embed every prompt in batches, reusing cached rows when the key list is unchanged."""
+    if previous_keys == keys and os.path.exists(path):
+        vectors = np.load(path)
+        if len(vectors) == len(keys):
+            print(f"♻️ Reusing {len(keys)} cached prompt embeddings")
+            return vectors
+
+    rows = []
+    for start in tqdm(range(0, len(prompts), BATCH_SIZE), desc="Embedding prompts"):
+        rows.extend(embed_texts(prompts[start:start + BATCH_SIZE]))
+    vectors = np.asarray(rows, dtype="float32")
+    np.save(path, vectors)
+    return vectors
+
+
+def rank_prompts(index, metadata, router, keys, vectors, top_k=PRECOMPUTED_TOP_K, passage_index=None) -> dict:
+    """One batched FAISS search per category shard, then the app's MMR re-rank per prompt.
+
+    With a ``passage_index`` the batched search runs over passages (as the app does
+    for such releases) and the aggregated passage scores are the relevance.
+    """
+    by_scope = {}
+    for row, key in enumerate(keys):
+        category = router.known[key]
+        shard = router.shard_ids(category)
+        by_scope.setdefault(category if shard is not None else None, []).append(row)
+
+    entries = {}
+    for category, rows in by_scope.items():
+        allowed = router.shard_ids(category) if category else None
+        pool = index.ntotal if allowed is None else len(allowed)
+        n_candidates = min(pool, top_k * retrieval.OVERFETCH)
+        if passage_index is not None:
+            I, S = passage_index.search(vectors[rows], n_candidates, allowed)
+        else:
+            _, I = index.search(vectors[rows], n_candidates, params=retrieval.search_params(allowed))
+            S = [None] * len(rows)
+        for row, candidate_ids, scores in zip(rows, I, S):
+            results = retrieval.rerank(index, metadata, vectors[row], candidate_ids, top_k, candidate_scores=scores)
+            entries[keys[row]] = {"category": router.known[keys[row]], "ids": [r["id"] for r in results]}
+    return entries
+
+
+def generate_answers(entries: dict, prompts_by_key: dict, metadata):
+    """Fill in a RAG answer per prompt (same prompt template and model as the app).
+
+    Offline, so no hedging and a generous deadline; prompts that still time out are
+    left without an answer rather than storing the template fallback.
+    """
+    generator = Generator(hedge=False, deadline=ANSWER_DEADLINE)
+
+    def answer(key):
+        docs = [metadata[i] for i in entries[key]["ids"][:ANSWER_TOP_K]]
+        prompt, _ = build_rag_prompt(prompts_by_key[key], docs)
+        text, info = generator.complete(prompt)
+        if text is None:
+            raise TimeoutError("; ".join(info["errors"]) or f"no answer within {ANSWER_DEADLINE:g}s")
+        return key, text
+
+    with ThreadPoolExecutor(max_workers=ANSWER_WORKERS) as executor:
+        futures = [executor.submit(answer, key) for key in entries]
+        for future in tqdm(futures, desc="Generating answers"):
+            try:
+                key, text = future.result()
+                entries[key]["answer"] = text
+            except Exception as e:
+                print(f"❌ Answer failed: {e}")
+
+
+def precompute(with_answers: bool = False, index_file: str = None,
+               metadata_file: str = None, out_file: str = PRECOMPUTED_FILE):
+    import faiss  # kept out of module scope: the app imports this module for load_store only
+    version, index_file, metadata_file = resolve_files(index_file, metadata_file)
+    index = faiss.read_index(index_file)
+    with open(metadata_file, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+
+    prompt_map = get_prompts_by_category()
+    router = QueryRouter(prompt_map)
+    router.set_shards(metadata)
+
+    prompts_by_key = {}
+    for prompts in prompt_map.values():
+        for prompt in prompts:
+            prompts_by_key.setdefault(normalize_query(prompt), prompt)
+    keys = list(prompts_by_key)
+    print(f"🗂️ {len(keys)} unique prompts")
+
+    previous = load_store(out_file)
+    start = time.perf_counter()
+    vectors = embed_prompts(keys, [prompts_by_key[k] for k in keys], previous_keys=previous.get("embedding_keys"))
+    if vectors.shape[1] != index.d:
+        raise ValueError(f"Embedding dimension mismatch: prompts({vectors.shape[1]}) vs index({index.d})")
+
+    entries = rank_prompts(index, metadata, router, keys, vectors,
+                           passage_index=load_passages(os.path.dirname(index_file)))
+    print(f"🔍 Ranked {len(entries)} prompts in {time.perf_counter() - start:.1f}s")
+    if with_answers:
+        generate_answers(entries, prompts_by_key, metadata)
+
+    store = {
+        "index_version": version,
+        "top_k": PRECOMPUTED_TOP_K,
+        "answer_top_k": ANSWER_TOP_K if with_answers else None,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "embedding_keys": keys,
+        "entries": entries,
+    }
+    with open(out_file + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(store, f)
+    os.replace(out_file + ".tmp", out_file)
+    print(f"✅ Precomputed results saved to {out_file}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute top-k results for the whole prompt catalog")
+    parser.add_argument("--with-answers", action="store_true", help="Also generate and store RAG answers")
+    args = parser.parse_args()
+    precompute(with_answers=args.with_answers)
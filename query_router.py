@@ -0,0 +1,133 @@
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+# ──────────────────────────────────────────────
+# ⚙️ Routing settings
+# ──────────────────────────────────────────────
+MIN_CONFIDENCE = 0.6      # posterior needed before a query is restricted to one category
+SMOOTHING = 0.1           # additive smoothing for keyword → category counts
+MIN_SHARD_SIZE = 20       # smaller shards are not worth restricting to
+
+_TOKEN_RE = re.compile(r"[a-z0-9$]+(?:[.-][a-z0-9]+)*")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace so equivalent queries share a key."""
+    return " ".join(_TOKEN_RE.findall(query.lower()))
+
+
+def _stem(token: str) -> str:
+    # Cheap plural folding so "laptop" and "laptops" share a keyword
+    return token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+
+
+def tokenize(query: str) -> List[str]:
+    return [_stem(t) for t in normalize_query(query).split()]
+
+
+class Route(NamedTuple):
+    kind: str                         # "known", "category" or "global"
+    category: Optional[str]
+    confidence: float
+    cached_ids: Optional[List[int]]   # precomputed ranking for a known prompt
+
+
+class QueryRouter:
+    """Routes queries without touching the embedding API.
+
+    Known prompts are matched by exact normalized key and may carry a precomputed
+    ranking. Everything else goes through a keyword classifier trained on the prompt
+    catalog; a confident prediction restricts the search to that category's shard.
+    """
+
+    def __init__(self, prompt_map: Dict[str, List[str]], min_confidence: float = MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        self.categories = list(prompt_map)
+        self.known = {}
+        self.precomputed = {}
+        self.answers = {}
+        self.answer_top_k = None
+        self.shards = {}
+        self.vectors = {}
+
+        counts = {}
+        for c, (category, prompts) in enumerate(prompt_map.items()):
+            for prompt in prompts:
+                self.known.setdefault(normalize_query(prompt), category)
+            tokens = Counter(tokenize(category.replace("_", " ")))
+            for prompt in prompts:
+                tokens.update(set(tokenize(prompt)))
+            for token, n in tokens.items():
+                counts.setdefault(token, np.zeros(len(self.categories), dtype=np.float32))[c] += n
+
+        # log P(category | token), one row per vocabulary token
+        self.vocab = {token: row for row, token in enumerate(counts)}
+        matrix = np.vstack(list(counts.values())) + SMOOTHING
+        self.log_probs = np.log(matrix / matrix.sum(axis=1, keepdims=True))
+
+    def set_shards(self, metadata: List[dict]):
+        """Group product ids by category so a routed query can search one shard."""
+        categories = np.array([m.get("category") or "" for m in metadata])
+        self.shards = {
+            category: np.flatnonzero(categories == category).astype("int64")
+            for category in np.unique(categories)
+        }
+
+    def classify(self, query: str):
+        """Return (category, confidence) from keywords alone, or (None, 0.0)."""
+        rows = [self.vocab[t] for t in tokenize(query) if t in self.vocab]
+        if not rows:
+            return None, 0.0
+        scores = self.log_probs[rows].sum(axis=0)
+        posterior = np.exp(scores - scores.max())
+        posterior /= posterior.sum()
+        best = int(np.argmax(posterior))
+        return self.categories[best], float(posterior[best])
+
+    def remember(self, query: str, ids: List[int]):
+        """Cache the final ranking of a known prompt so repeats skip embedding and search."""
+        key = normalize_query(query)
+        if key in self.known:
+            self.precomputed[key] = [int(i) for i in ids]
+
+    def load_precomputed(self, store: dict):
+        """Adopt rankings (and answers) from precompute.py's store for the current index."""
+        for key, entry in store.get("entries", {}).items():
+            if key in self.known:
+                self.precomputed[key] = entry["ids"]
+                if entry.get("answer"):
+                    self.answers[key] = entry["answer"]
+        self.answer_top_k = store.get("answer_top_k")
+
+    def load_prompt_vectors(self, keys: List[str], vectors: np.ndarray):
+        """Adopt precompute.py's prompt embeddings, so known prompts never need the embedding API."""
+        self.vectors = {key: vector for key, vector in zip(keys, vectors) if key in self.known}
+
+    def prompt_vector(self, query: str) -> Optional[np.ndarray]:
+        return self.vectors.get(normalize_query(query))
+
+    def cached_answer(self, query: str, ids: List[int]) -> Optional[str]:
+        """Stored RAG answer for a known prompt, if it was written for exactly these results."""
+        key = normalize_query(query)
+        if len(ids) != self.answer_top_k or list(ids) != self.precomputed.get(key, [])[:len(ids)]:
+            return None
+        return self.answers.get(key)
+
+    def route(self, query: str) -> Route:
+        key = normalize_query(query)
+        if key in self.known:
+            return Route("known", self.known[key], 1.0, self.precomputed.get(key))
+        category, confidence = self.classify(query)
+        if category is not None and confidence >= self.min_confidence:
+            return Route("category", category, confidence, None)
+        return Route("global", None, confidence, None)
+
+    def shard_ids(self, category: Optional[str]) -> Optional[np.ndarray]:
+        """Ids in ``category``'s shard, or None when the shard is missing or too small to matter."""
+        ids = self.shards.get(category)
+        if ids is None or len(ids) < MIN_SHARD_SIZE:
+            return None
+        return ids
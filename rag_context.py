@@ -0,0 +1,131 @@
+import threading
+from typing import List, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # fall back to a character-based estimate
+    tiktoken = None
+
+# ──────────────────────────────────────────────
+# ⚙️ Context budget
+# ──────────────────────────────────────────────
+CONTEXT_TOKEN_BUDGET = 1200   # tokens of PRODUCT DATA sent to the model
+MIN_SUMMARY_TOKENS = 16       # below this a summary is dropped rather than cut to a stub
+MAX_SUMMARY_TOKENS = 120      # per-document cap so one long summary can't crowd out the rest
+TOKENIZER_ENCODING = "o200k_base"  # gpt-4o / gpt-4o-mini
+CHARS_PER_TOKEN = 4           # estimate used when tiktoken is unavailable
+
+RAG_PROMPT_TEMPLATE = """
+You are ShopLyst, an AI-powered shopping assistant.
+
+The user searched for: '{query}'.
+
+Below are some related product listings. Your job:
+- Analyze them collectively.
+- Identify **the single most suitable option or combination** for the user.
+- Give a clear, concise recommendation — 3 to 5 sentences max.
+- Maintain a confident, helpful tone (like a top-tier shopping guide).
+- If any product lacks price or rating, naturally phrase around it (e.g., "well-reviewed" or "affordable option").
+- End your message with a small call-to-action like “You might want to start here.”
+
+PRODUCT DATA:
+{context}
+
+Return only the final recommendation text (no bullets, no headings).
+"""
+
+_encoding = None
+_encoding_tried = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    # Loaded once: tiktoken may download the BPE file, which must not happen per call or per thread
+    global _encoding, _encoding_tried
+    if not _encoding_tried:
+        with _encoding_lock:
+            if not _encoding_tried and tiktoken is not None:
+                try:
+                    _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+                except Exception:  # encoding file could not be fetched; keep estimating
+                    pass
+            _encoding_tried = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Token count under the chat model's tokenizer (or a chars/4 estimate)."""
+    enc = _get_encoding()
+    if enc is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` to at most ``max_tokens`` tokens, marking the cut with an ellipsis."""
+    if max_tokens <= 0:
+        return ""
+    enc = _get_encoding()
+    if enc is None:
+        limit = max_tokens * CHARS_PER_TOKEN
+        return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+    tokens = enc.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return enc.decode(tokens[:max_tokens - 1]).rstrip() + "…"
+
+
+def _format_doc(item: dict, summary: str) -> str:
+    lines = [
+        f"Title: {item['title']}",
+        f"Price: {item.get('price') or 'Not available'}",
+        f"Rating: {item.get('rating') or 'Not available'}",
+    ]
+    if summary:
+        lines.append(f"Summary: {summary}")
+    lines.append(f"URL: {item['url']}")
+    return "\n".join(lines)
+
+
+def build_context(docs: List[dict], budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, int, int]:
+    """Pack documents in rank order into ``budget`` tokens.
+
+    Each document costs its fixed fields plus as much of its summary as still fits
+    (at most MAX_SUMMARY_TOKENS).
+    Packing stops at the first document whose fixed fields no longer fit.
+    Returns (context, tokens_used, docs_used).
+    """
+    blocks = []
+    used = 0
+    separator = count_tokens("\n\n")
+    for item in docs:
+        cost_sep = separator if blocks else 0
+        header_tokens = count_tokens(_format_doc(item, ""))
+        remaining = budget - used - cost_sep - header_tokens
+        if remaining < 0:
+            break
+
+        summary = (item.get("summary") or "").strip()
+        if summary:
+            # "Summary: " label plus its newline
+            room = min(remaining - count_tokens("\nSummary: "), MAX_SUMMARY_TOKENS)
+            summary = truncate_tokens(summary, room) if room >= MIN_SUMMARY_TOKENS else ""
+
+        block = _format_doc(item, summary)
+        blocks.append(block)
+        used += cost_sep + count_tokens(block)
+    return "\n\n".join(blocks), used, len(blocks)
+
+
+def build_rag_prompt(query: str, docs: List[dict], budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, dict]:
+    """Render the recommendation prompt; returns (prompt, stats) with token counts."""
+    context, context_tokens, docs_used = build_context(docs, budget)
+    prompt = RAG_PROMPT_TEMPLATE.format(query=query, context=context)
+    stats = {
+        "prompt_tokens": count_tokens(prompt),
+        "context_tokens": context_tokens,
+        "docs_used": docs_used,
+        "docs_given": len(docs),
+        "budget": budget,
+    }
+    return prompt, stats
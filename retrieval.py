@@ -0,0 +1,147 @@
+from typing import List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+
+from telemetry import span
+
+# ──────────────────────────────────────────────
+# ⚙️ Re-ranking settings
+# ──────────────────────────────────────────────
+OVERFETCH = 4             # candidates fetched per requested result
+MMR_LAMBDA = 0.7          # 1.0 = pure relevance, 0.0 = pure diversity
+MAX_PER_SOURCE = 2        # at most this many results from one domain
+PROFILE_WEIGHT = 0.25     # share of a candidate's score taken from the session profile
+
+
+def source_of(item: dict) -> str:
+    """Registered domain of a product, falling back to the URL host for older metadata."""
+    source = item.get("source")
+    if source:
+        return source
+    host = urlparse(item.get("url", "")).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def candidate_vectors(index, ids: np.ndarray) -> np.ndarray:
+    """Reconstruct stored vectors for ``ids`` (flat and IVF-with-direct-map indexes)."""
+    ids = np.asarray(ids, dtype="int64")
+    try:
+        return index.reconstruct_batch(ids)
+    except (AttributeError, RuntimeError):
+        return np.vstack([index.reconstruct(int(i)) for i in ids]).astype("float32")
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def mmr_select(relevance: np.ndarray, vectors: np.ndarray, k: int, lambda_: float = MMR_LAMBDA,
+               sources: Optional[List[str]] = None, max_per_source: Optional[int] = MAX_PER_SOURCE) -> List[int]:
+    """Maximal Marginal Relevance over candidates; returns selected candidate positions in order.
+
+    ``relevance`` is each candidate's similarity to the query and ``vectors`` their
+    embeddings. The pairwise similarity matrix is computed once, and every step is a
+    vector update, so the cost is O(k·n) on top of a single n×n matmul.
+    """
+    n = len(relevance)
+    if n == 0:
+        return []
+    unit = _normalize(vectors)
+    pairwise = unit @ unit.T
+
+    if sources is not None and max_per_source:
+        source_ids = np.unique(np.asarray(sources), return_inverse=True)[1]
+        source_counts = np.zeros(source_ids.max() + 1, dtype=np.int32)
+    else:
+        source_ids = None
+
+    max_sim = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected = []
+    while len(selected) < k and available.any():
+        redundancy = np.where(np.isfinite(max_sim), max_sim, 0.0)
+        scores = lambda_ * relevance - (1.0 - lambda_) * redundancy
+        scores = np.where(available, scores, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        max_sim = np.maximum(max_sim, pairwise[best])
+        if source_ids is not None:
+            source_counts[source_ids[best]] += 1
+            if source_counts[source_ids[best]] >= max_per_source:
+                available &= source_ids != source_ids[best]
+    return selected
+
+
+def search_params(allowed_ids: Optional[np.ndarray]):
+    """FAISS search parameters restricting the scan to ``allowed_ids`` (None = no restriction)."""
+    if allowed_ids is None:
+        return None
+    import faiss
+    selector = faiss.IDSelectorBatch(np.ascontiguousarray(allowed_ids, dtype="int64"))
+    params = faiss.SearchParameters(sel=selector)
+    params._selector = selector  # keep the selector alive as long as the params
+    return params
+
+
+def search(index, metadata: List[dict], query_vector: np.ndarray, top_k: int, overfetch: int = OVERFETCH,
+           lambda_: float = MMR_LAMBDA, max_per_source: Optional[int] = MAX_PER_SOURCE,
+           allowed_ids: Optional[np.ndarray] = None, profile_vector: Optional[np.ndarray] = None,
+           passages=None) -> List[dict]:
+    """Over-fetch from FAISS, then diversify with MMR and per-source caps.
+
+    ``allowed_ids`` (e.g. from attributes.filter_ids) limits the search to those
+    products inside FAISS itself, so filtering never shrinks the result list.
+    ``profile_vector`` (personalization.SessionProfile) tilts the candidates' scores
+    towards the session's interests before MMR. With ``passages`` (a
+    passages.PassageIndex) candidates are products ranked by their passage hits,
+    and that aggregated score is their relevance.
+    Returns copies of the metadata entries with their FAISS ``id`` and query ``score``.
+    """
+    pool = index.ntotal if allowed_ids is None else len(allowed_ids)
+    n_candidates = min(pool, max(top_k, top_k * overfetch))
+    if n_candidates == 0:
+        return []
+    if passages is not None:
+        with span("passage_search"):
+            ids, scores = passages.search(query_vector, n_candidates, allowed_ids)
+        return rerank(index, metadata, query_vector, ids[0], top_k, lambda_, max_per_source, profile_vector,
+                      candidate_scores=scores[0])
+    with span("faiss_search"):
+        _, I = index.search(np.asarray([query_vector], dtype="float32"), n_candidates,
+                            params=search_params(allowed_ids))
+    return rerank(index, metadata, query_vector, I[0], top_k, lambda_, max_per_source, profile_vector)
+
+
+def rerank(index, metadata: List[dict], query_vector: np.ndarray, candidate_ids: np.ndarray, top_k: int,
+           lambda_: float = MMR_LAMBDA, max_per_source: Optional[int] = MAX_PER_SOURCE,
+           profile_vector: Optional[np.ndarray] = None, profile_weight: float = PROFILE_WEIGHT,
+           candidate_scores: Optional[np.ndarray] = None) -> List[dict]:
+    """MMR + per-source caps over already retrieved FAISS ids (-1 padding is ignored).
+
+    Relevance is the candidate vector's cosine with the query unless
+    ``candidate_scores`` (aligned with ``candidate_ids``) supplies it.
+    """
+    ids = np.asarray(candidate_ids)
+    valid = (ids >= 0) & (ids < len(metadata))
+    ids = ids[valid]
+    if len(ids) == 0:
+        return []
+
+    with span("reconstruct"):
+        vectors = candidate_vectors(index, ids)
+    with span("mmr"):
+        unit = _normalize(vectors)
+        if candidate_scores is None:
+            relevance = unit @ _normalize(np.asarray(query_vector, dtype="float32"))
+        else:
+            relevance = np.asarray(candidate_scores, dtype="float32")[valid]
+        if profile_vector is not None:
+            relevance = (1.0 - profile_weight) * relevance + profile_weight * (unit @ profile_vector)
+        sources = [source_of(metadata[i]) for i in ids]
+        order = mmr_select(relevance, vectors, top_k, lambda_, sources, max_per_source)
+
+    with span("metadata_lookup"):
+        return [dict(metadata[ids[p]], id=int(ids[p]), score=float(relevance[p])) for p in order]
@@ -1,19 +1,27 @@
-import os
+import time
+import cProfile
+import pstats
+import argparse
 import requests
-from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 import tldextract
-import json
 from tqdm import tqdm
 import re
 from readability import Document
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from time import sleep
+from typing import NamedTuple
 import random
 
+import crawl_metrics  # Fetch / parse timings and per-domain counters
+from crawl_metrics import TimedHTTPAdapter
+from crawl_scheduler import MAX_CONCURRENCY, DomainScheduler, is_blocked_page  # Per-domain politeness
 from product_scrapper import search_google_products  # Google scraping logic
 from prompt_feeder import get_prompts_by_category, get_timestamp  # Prompt and timestamp utilities
+from page_archive import PAGE_ARCHIVE_FILE, PageArchive, ReplayAdapter, parseable_pages  # Raw pages for offline replay
+from scrape_store import SegmentStore  # Append-only compressed storage
+from telemetry import record, span  # Stage timings
 
 # Pool of user agents to rotate
 USER_AGENTS = [
@@ -22,84 +30,228 @@ USER_AGENTS = [
     "Mozilla/5.0 (X11; Ubuntu; Linux x86_64) Gecko/20100101 Firefox/117.0",
 ]
 
-# Build a session with retries + backoff
+# Build a session with retries + backoff.
+# 429/503 are not retried here: the scheduler backs the whole domain off instead.
 session = requests.Session()
 retries = Retry(
     total=3,                      # fewer retries = less waiting
     backoff_factor=0.5,           # 0.5s, 1s, 2s
-    status_forcelist=[429, 500, 502, 503, 504],
+    status_forcelist=[500, 502, 504],
     allowed_methods=["HEAD", "GET", "OPTIONS"]
 )
 
-session.mount("https://", HTTPAdapter(max_retries=retries))
-session.mount("http://", HTTPAdapter(max_retries=retries))
+session.mount("https://", TimedHTTPAdapter(max_retries=retries))
+session.mount("http://", TimedHTTPAdapter(max_retries=retries))
+
+# Shared across all worker threads so pacing is per domain, not per prompt
+scheduler = DomainScheduler()
+
+# All prompts append into the same per-category segments
+store = SegmentStore()
+
+# Set by --record: every fetched page is also archived for offline replay / profiling
+archive = None
+
+PROFILE_PAGES = 200            # pages replayed by --profile
+REPLAY_RATE = 1e9              # effectively unpaced while replaying
+PROFILE_OUTPUT = "crawl_profile.prof"
+
+# Download limits: pages are streamed and cut off at MAX_PAGE_BYTES
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+CHUNK_BYTES = 64 * 1024
+SNIFF_BYTES = 4096             # where <meta charset> must appear per the HTML spec
+DETECT_BYTES = 32 * 1024       # prefix handed to charset detection as a last resort
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?\s*([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+
+
+class FetchedPage(NamedTuple):
+    url: str
+    status_code: int
+    headers: dict
+    text: str
+    content: bytes
+    truncated: bool
+
+
+def detect_encoding(content_type, body):
+    """Pick a codec from the Content-Type header, then <meta charset>, then a bounded sniff."""
+    for part in content_type.split(";")[1:]:
+        key, _, value = part.strip().partition("=")
+        if key.lower() == "charset" and value:
+            return value.strip("\"' ")
+
+    match = CHARSET_RE.search(body[:SNIFF_BYTES])
+    if match:
+        return match.group(1).decode("ascii", "ignore")
+
+    prefix = body[:DETECT_BYTES]
+    try:
+        prefix.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        # A multi-byte char cut at the prefix boundary is still utf-8
+        if e.start >= len(prefix) - 3:
+            return "utf-8"
+    detected = requests.compat.chardet.detect(prefix) if requests.compat.chardet else {}
+    return detected.get("encoding") or "utf-8"
+
+
+def read_capped(res, limit=MAX_PAGE_BYTES):
+    """Read a streamed body up to ``limit`` bytes; returns (bytes, truncated)."""
+    chunks, size = [], 0
+    for chunk in res.iter_content(chunk_size=CHUNK_BYTES):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            return b"".join(chunks)[:limit], True
+    return b"".join(chunks), False
 
 
 def try_fetch(url):
+    if not scheduler.allowed(url):
+        print(f"🚫 Disallowed by robots.txt: {url}")
+        return None
+
+    scheduler.acquire(url)
+    domain = scheduler.domain_of(url)
+    outcome = "error"
     try:
         headers = {"User-Agent": random.choice(USER_AGENTS)}
-        res = session.get(url, headers=headers, timeout=10, verify=True)
-        res.encoding = res.apparent_encoding
-        return res
+        with session.get(url, headers=headers, timeout=10, verify=True, stream=True) as res:
+            # Request sent → headers parsed; includes DNS/connect on a fresh connection
+            record("crawl_ttfb", res.elapsed.total_seconds())
+            if res.status_code in (429, 503):
+                outcome = "throttled"
+                _archive_response(url, res)
+                crawl_metrics.record_page(domain, "throttled")
+                print(f"🐢 Throttled ({res.status_code}) by {domain}")
+                return None
+            if res.status_code in (401, 403) or is_blocked_page(res.status_code, ""):
+                # The site is refusing us: back off like a 429 (release() shrinks the window)
+                outcome = "throttled"
+                _archive_response(url, res)
+                crawl_metrics.record_page(domain, "refused")
+                print(f"🤖 Refused ({res.status_code}) by {domain}")
+                return None
+            if res.status_code >= 400:
+                _archive_response(url, res)
+                crawl_metrics.record_page(domain, "error")
+                return None
+            outcome = "ok"  # only 2xx/3xx grow the domain's window
+
+            # Skip PDFs, images, feeds etc. before downloading a single body byte
+            content_type = res.headers.get("Content-Type", "")
+            if content_type and not content_type.lower().startswith(HTML_CONTENT_TYPES):
+                _archive_response(url, res)
+                crawl_metrics.record_page(domain, "skipped")
+                print(f"⏭️ Skipping non-HTML ({content_type.split(';')[0]}): {url}")
+                return None
+
+            start = time.perf_counter()
+            body, truncated = read_capped(res)
+            record("crawl_download", time.perf_counter() - start)
+            crawl_metrics.record_page(domain, "ok", len(body))
+            _archive_response(url, res, body)
+
+            return decode_page(res.url, res.status_code, dict(res.headers), body, truncated)
     except Exception as e:
+        crawl_metrics.record_page(domain, "error")
         print(f"❌ Failed for {url}: {e}")
         return None
+    finally:
+        scheduler.release(url, outcome)
+
+
+def _archive_response(url, res, body=b""):
+    if archive is not None:
+        archive.add(url, res.status_code, res.headers, body, final_url=res.url)
+
+
+def decode_page(url, status_code, headers, body, truncated=False):
+    """Decode a raw body into a FetchedPage using the header / meta / sniffed charset."""
+    encoding = detect_encoding(headers.get("Content-Type", ""), body)
+    try:
+        text = body.decode(encoding, errors="replace")
+    except LookupError:
+        text = body.decode("utf-8", errors="replace")
+    return FetchedPage(url, status_code, headers, text, body, truncated)
 
 
 
 def extract_product_info(url):
     """Extract structured product info from a product page."""
     try:
-        res = try_fetch(url)
+        with span("crawl_fetch"):
+            res = try_fetch(url)
         if not res:
             return None
+        return parse_product_page(url, res)
+
+    except Exception as e:
+        print(f"❌ Failed to scrape {url}: {e}")
+        return None
 
-        doc = Document(res.text)
-        clean_html = doc.summary()
+
+def parse_product_page(url, res):
+    """Turn a fetched page into a product record (None for error and bot-check pages)."""
+    with span("crawl_parse_readability"):
+        clean_html = Document(res.text).summary()
+    with span("crawl_parse_soup"):
         soup_clean = BeautifulSoup(clean_html, "lxml")
         visible_text = soup_clean.get_text(separator=" ", strip=True)
         soup = BeautifulSoup(res.text, "lxml")
 
-        title = soup.title.string.strip() if soup.title else ""
-        if title.lower().startswith("sorry!") or "something went wrong" in title.lower():
-            print(f"⚠️ Skipping broken/error page: {url}")
-            return None
+    title = soup.title.string.strip() if soup.title and soup.title.string else ""
+    if title.lower().startswith("sorry!") or "something went wrong" in title.lower():
+        print(f"⚠️ Skipping broken/error page: {url}")
+        return None
+    if is_blocked_page(res.status_code, title, visible_text):
+        scheduler.report_blocked(url)
+        crawl_metrics.record_page(scheduler.domain_of(url), "blocked")
+        print(f"🤖 Skipping bot-check page: {url}")
+        return None
 
-        meta_desc = soup.find("meta", attrs={"name": "description"})
-        og_desc = soup.find("meta", attrs={"property": "og:description"})
-        description = (meta_desc.get("content") if meta_desc else "") or (og_desc.get("content") if og_desc else "")
+    meta_desc = soup.find("meta", attrs={"name": "description"})
+    og_desc = soup.find("meta", attrs={"property": "og:description"})
+    description = (meta_desc.get("content") if meta_desc else "") or (og_desc.get("content") if og_desc else "")
 
-        source = tldextract.extract(url).registered_domain
+    source = tldextract.extract(url).registered_domain
 
-        price_matches = re.findall(r"\$\d{1,5}(?:\.\d{2})?", soup.text)
+    with span("crawl_parse_regex"):
+        page_text = soup.text
+        price_matches = re.findall(r"\$\d{1,5}(?:\.\d{2})?", page_text)
         price_text = price_matches[0] if price_matches else ""
 
-        match = re.search(r"(\d\.\d)\s*out of\s*5", soup.text, re.IGNORECASE)
+        match = re.search(r"(\d\.\d)\s*out of\s*5", page_text, re.IGNORECASE)
         if match:
             rating_text = match.group(1)
         else:
-            star_match = re.search(r"(★{1,5})", soup.text)
+            star_match = re.search(r"(★{1,5})", page_text)
             rating_text = str(len(star_match.group(1))) if star_match else ""
 
-        return {
-            "title": title,
-            "summary": description,
-            "full_text": visible_text[:5000],  # cap at 5k chars
-            "url": url,
-            "source": source,
-            "price": price_text,
-            "rating": rating_text
-        }
+    return {
+        "title": title,
+        "summary": description,
+        "full_text": visible_text[:5000],  # cap at 5k chars
+        "url": url,
+        "source": source,
+        "price": price_text,
+        "rating": rating_text
+    }
 
-    except Exception as e:
-        print(f"❌ Failed to scrape {url}: {e}")
-        return None
 
+def scrape_prompt(prompt, workers=20, search_fn=search_google_products):
+    """Search a prompt and extract every result page with multi-threading.
 
-def run_scraper_for_prompt(prompt, category, workers=20):
-    """Run scraper for a single prompt with multi-threading."""
+    ``search_fn(prompt)`` returns the result links; replays pass the archived searches.
+    """
     print(f"\n🔍 Searching for: {prompt}")
-    links = search_google_products(prompt)
+    with span("crawl_search"):
+        links = search_fn(prompt)
+    if archive is not None:
+        archive.add_search(prompt, links)
     final_data = []
 
     with ThreadPoolExecutor(max_workers=workers) as executor:
@@ -108,22 +260,90 @@ def run_scraper_for_prompt(prompt, category, workers=20):
             data = future.result()
             if data:
                 final_data.append(data)
+    return final_data
+
+
+def run_scraper_for_prompt(prompt, category, workers=20, search_fn=search_google_products):
+    """Run scraper for a single prompt and append the results to the store."""
+    final_data = scrape_prompt(prompt, workers, search_fn)
 
     if final_data:
         timestamp = get_timestamp()
-        out_dir = os.path.join("scraped_results", category)
-        os.makedirs(out_dir, exist_ok=True)
-        output_path = os.path.join(out_dir, f"{prompt.replace(' ', '_')}_{timestamp}.jsonl")
-        with open(output_path, "w", encoding="utf-8") as f:
-            for p in final_data:
-                f.write(json.dumps(p) + "\n")
+        for p in final_data:
+            p["prompt"] = prompt
+            p["scraped_at"] = timestamp
+        output_path = store.append(category, final_data)
         print(f"✅ Saved {len(final_data)} items to {output_path}")
     else:
         print("⚠️ No valid results found for:", prompt)
+    return final_data
+
+def use_replay(archive_path=PAGE_ARCHIVE_FILE):
+    """Serve page fetches from the archive instead of the network; returns (pages, searches).
+
+    Pass ``searches.get`` as ``search_fn`` to scrape_prompt to replay the archived
+    searches too. Pacing is lifted (robots.txt is not archived and there is no server
+    to be polite to): no rate limit and every domain starts at full concurrency, so
+    replayed crawls measure our own CPU cost rather than politeness delays.
+    """
+    pages, searches = PageArchive(archive_path).load()
+    adapter = ReplayAdapter(pages)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    scheduler.configure(default_rate=REPLAY_RATE, burst=REPLAY_RATE, respect_robots=False,
+                        initial_concurrency=MAX_CONCURRENCY)
+    return pages, searches
+
+
+def profile_replay(archive_path=PAGE_ARCHIVE_FILE, limit=PROFILE_PAGES, output=PROFILE_OUTPUT):
+    """Run extraction over archived HTML pages under cProfile; no network access."""
+    pages = parseable_pages(PageArchive(archive_path).pages())[:limit]
+    if not pages:
+        print(f"⚠️ No archived HTML pages in {archive_path}; crawl once with --record first")
+        return
+
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    extracted = 0
+    for page in pages:
+        res = decode_page(page["final_url"], page["status"], page["headers"], page["body"])
+        try:
+            extracted += parse_product_page(page["url"], res) is not None
+        except Exception as e:
+            print(f"❌ Failed to parse {page['url']}: {e}")
+    profiler.disable()
+    elapsed = time.perf_counter() - start
+
+    print(f"⏱️ Replayed {len(pages)} pages ({extracted} products) in {elapsed:.2f}s "
+          f"= {len(pages) / elapsed:.1f} pages/s")
+    print(crawl_metrics.report())
+    profiler.dump_stats(output)
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+    print(f"✅ Profile saved to {output} (open with snakeviz or python -m pstats)")
 
 
 if __name__ == "__main__":
-    prompt_map = get_prompts_by_category()
-    for category, prompts in prompt_map.items():
-        for prompt in prompts:
-            run_scraper_for_prompt(prompt, category)
+    parser = argparse.ArgumentParser(description="Crawl product pages for every catalog prompt")
+    parser.add_argument("--record", action="store_true", help="Archive every fetched page for offline replay")
+    parser.add_argument("--archive", default=PAGE_ARCHIVE_FILE)
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile extraction over archived pages instead of crawling")
+    parser.add_argument("--profile-pages", type=int, default=PROFILE_PAGES)
+    parser.add_argument("--profile-output", default=PROFILE_OUTPUT)
+    args = parser.parse_args()
+
+    if args.profile:
+        profile_replay(args.archive, args.profile_pages, args.profile_output)
+    else:
+        if args.record:
+            archive = PageArchive(args.archive)
+        try:
+            prompt_map = get_prompts_by_category()
+            for category, prompts in prompt_map.items():
+                for prompt in prompts:
+                    run_scraper_for_prompt(prompt, category)
+        finally:
+            if archive is not None:
+                archive.flush()
+            print(crawl_metrics.report())
@@ -0,0 +1,276 @@
+import argparse
+import gzip
+import io
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # gzip segments still work, just larger and slower to read
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: manifest updates are only serialized within one process
+    fcntl = None
+
+# Directory containing one folder of segments per category
+SCRAPED_RESULTS_DIR = "scraped_results"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "manifest.lock"  # flock'd around every manifest read-modify-write
+
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024  # roll to a new segment past this size
+SEGMENT_SUFFIX = ".jsonl.zst" if zstandard else ".jsonl.gz"
+ZSTD_LEVEL = 6
+
+
+def compress_frame(data: bytes, suffix: str) -> bytes:
+    """Compress one batch into a self-contained frame; frames concatenate into a segment."""
+    if suffix.endswith(".zst"):
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return gzip.compress(data)
+
+
+def open_frames(raw: bytes, suffix: str):
+    """Return a text stream over every frame in ``raw``."""
+    if suffix.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read .zst segments (pip install zstandard)")
+        reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(raw), read_across_frames=True)
+    else:
+        reader = gzip.GzipFile(fileobj=io.BytesIO(raw))
+    return io.TextIOWrapper(reader, encoding="utf-8")
+
+
+def segment_suffix(path: str) -> str:
+    return ".jsonl.zst" if path.endswith(".zst") else ".jsonl.gz"
+
+
+class SegmentStore:
+    """Append-only, compressed scrape storage.
+
+    Each category owns a sequence of segments under ``<base_dir>/<category>/``. Writers
+    append one compressed frame per batch to the category's open segment and then record
+    the committed byte length in ``manifest.json``; readers only read up to that length,
+    so a crawl in progress never exposes half-written frames to the indexer. Manifest
+    updates hold a file lock, so a crawler and the pipeline can write from separate
+    processes without losing each other's segments.
+    """
+
+    def __init__(self, base_dir: str = SCRAPED_RESULTS_DIR):
+        self.base_dir = Path(base_dir)
+        self.manifest_path = self.base_dir / MANIFEST_FILE
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive access to the manifest across threads and processes."""
+        with self._lock:
+            self.base_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.base_dir / LOCK_FILE, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ── manifest ───────────────────────────────
+    def load_manifest(self) -> dict:
+        if self.manifest_path.exists():
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"next_id": 1, "segments": []}
+
+    def _save_manifest(self, manifest: dict):
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def _new_segment(self, manifest: dict, category: str) -> dict:
+        seg_id = manifest["next_id"]
+        manifest["next_id"] = seg_id + 1
+        segment = {
+            "path": f"{category}/segment-{seg_id:06d}{SEGMENT_SUFFIX}",
+            "category": category,
+            "records": 0,
+            "bytes": 0,
+            "sealed": False,
+        }
+        manifest["segments"].append(segment)
+        return segment
+
+    # ── write ──────────────────────────────────
+    def append(self, category: str, records: list) -> str:
+        """Append a batch of records for ``category``; returns the segment path written."""
+        if not records:
+            return ""
+        payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+
+        with self._locked():
+            manifest = self.load_manifest()
+            segment = next(
+                (s for s in manifest["segments"] if s["category"] == category and not s["sealed"]),
+                None,
+            )
+            if segment is None:
+                segment = self._new_segment(manifest, category)
+
+            path = self.base_dir / segment["path"]
+            path.parent.mkdir(parents=True, exist_ok=True)
+            frame = compress_frame(payload, segment_suffix(segment["path"]))
+            with open(path, "ab") as f:
+                # Drop any torn tail left by a crash after the last committed frame
+                f.truncate(segment["bytes"])
+                f.write(frame)
+                f.flush()
+                os.fsync(f.fileno())
+
+            segment["records"] += len(records)
+            segment["bytes"] += len(frame)
+            if segment["bytes"] >= SEGMENT_MAX_BYTES:
+                segment["sealed"] = True
+            self._save_manifest(manifest)
+            return str(path)
+
+    # ── read ───────────────────────────────────
+    def _iter_segment(self, segment: dict):
+        path = self.base_dir / segment["path"]
+        with open(path, "rb") as f:
+            raw = f.read(segment["bytes"])
+        for line in open_frames(raw, segment_suffix(segment["path"])):
+            if line.strip():
+                yield json.loads(line)
+
+    def _legacy_files(self):
+        """Loose per-prompt .jsonl files written before the segment store existed."""
+        return sorted(self.base_dir.rglob("*.jsonl")) if self.base_dir.exists() else []
+
+    def iter_records(self, categories=None):
+        """Yield every stored record (legacy files first, then segments in write order)."""
+        for file_path in self._legacy_files():
+            category = file_path.parent.name
+            if categories and category not in categories:
+                continue
+            try:
+                f = open(file_path, "r", encoding="utf-8")
+            except FileNotFoundError:  # folded into segments by a compaction; read below via the manifest
+                continue
+            with f:
+                for line in f:
+                    try:
+                        entry = json.loads(line.strip())
+                    except json.JSONDecodeError:
+                        print(f"⚠️ Skipping invalid JSON in {file_path}")
+                        continue
+                    entry["category"] = category
+                    yield entry
+
+        for segment in self.load_manifest()["segments"]:
+            if categories and segment["category"] not in categories:
+                continue
+            for entry in self._iter_segment(segment):
+                entry["category"] = segment["category"]
+                yield entry
+
+    # ── compaction ─────────────────────────────
+    def compact(self, category: str = None) -> dict:
+        """Rewrite each category into fresh segments holding only the latest record per URL.
+
+        Legacy .jsonl files are folded in and removed. Readers take no lock, so the
+        superseded segments are only listed as ``retired`` and deleted by the next
+        compaction: a read that started from the old manifest can still finish.
+        Returns {category: (before, after)}.
+        """
+        with self._locked():
+            manifest = self.load_manifest()
+            retired = manifest.pop("retired", [])
+            if retired:
+                for path in retired:
+                    (self.base_dir / path).unlink(missing_ok=True)
+                self._save_manifest(manifest)
+            categories = sorted(
+                {s["category"] for s in manifest["segments"]} | {p.parent.name for p in self._legacy_files()}
+            )
+            if category:
+                categories = [c for c in categories if c == category]
+
+            report = {}
+            for cat in categories:
+                latest = {}
+                before = 0
+                for entry in self.iter_records(categories=[cat]):
+                    before += 1
+                    entry.pop("category", None)
+                    # Later writes supersede earlier ones for the same URL
+                    latest.pop(entry.get("url"), None)
+                    latest[entry.get("url")] = entry
+
+                old_segments = [s for s in manifest["segments"] if s["category"] == cat]
+                old_legacy = [p for p in self._legacy_files() if p.parent.name == cat]
+                manifest["segments"] = [s for s in manifest["segments"] if s["category"] != cat]
+
+                records = list(latest.values())
+                for start in range(0, len(records), 10_000):
+                    batch = records[start:start + 10_000]
+                    segment = next(
+                        (s for s in manifest["segments"] if s["category"] == cat and not s["sealed"]),
+                        None,
+                    ) or self._new_segment(manifest, cat)
+                    frame = compress_frame(
+                        "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch).encode("utf-8"),
+                        segment_suffix(segment["path"]),
+                    )
+                    path = self.base_dir / segment["path"]
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    with open(path, "ab") as f:
+                        f.write(frame)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    segment["records"] += len(batch)
+                    segment["bytes"] += len(frame)
+                    if segment["bytes"] >= SEGMENT_MAX_BYTES:
+                        segment["sealed"] = True
+
+                # Publish the new segments; the old ones stay on disk until the next compaction
+                manifest.setdefault("retired", []).extend(s["path"] for s in old_segments)
+                self._save_manifest(manifest)
+                for p in old_legacy:
+                    p.unlink(missing_ok=True)
+
+                report[cat] = (before, len(records))
+            return report
+
+    def stats(self) -> dict:
+        manifest = self.load_manifest()
+        per_category = {}
+        for s in manifest["segments"]:
+            c = per_category.setdefault(s["category"], {"segments": 0, "records": 0, "bytes": 0})
+            c["segments"] += 1
+            c["records"] += s["records"]
+            c["bytes"] += s["bytes"]
+        return per_category
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or compact the scrape segment store")
+    parser.add_argument("command", choices=["stats", "compact"])
+    parser.add_argument("--dir", default=SCRAPED_RESULTS_DIR)
+    parser.add_argument("--category", default=None)
+    args = parser.parse_args()
+
+    store = SegmentStore(args.dir)
+    if args.command == "compact":
+        for cat, (before, after) in store.compact(args.category).items():
+            print(f"🧹 {cat}: {before} → {after} records")
+    else:
+        for cat, s in sorted(store.stats().items()):
+            print(f"📦 {cat}: {s['records']} records in {s['segments']} segments ({s['bytes'] / 1e6:.1f} MB)")
@@ -0,0 +1,98 @@
+import os
+import time
+import argparse
+
+import numpy as np
+from tqdm import tqdm
+
+from index_release import resolve_files
+from retrieval import candidate_vectors
+
+# ──────────────────────────────────────────────
+# ⚙️ "More like this" graph settings
+# ──────────────────────────────────────────────
+SIMILAR_FILE = "similar_items.npz"
+SIMILAR_K = 10            # neighbours stored per product
+CHUNK_ROWS = 4096         # query rows per batched search (bounds the distance matrix)
+
+
+def build_similar(index, k: int = SIMILAR_K, chunk_rows: int = CHUNK_ROWS):
+    """kNN graph over every vector in ``index``: row i = i's nearest other products.
+
+    One batched index.search per chunk (a chunked all-pairs matmul for flat indexes,
+    an approximate search for IVF/HNSW ones). Returns (ids int32 [n, k], scores
+    float16 [n, k]); missing neighbours are -1 / 0. Scores are cosine similarities,
+    derived from L2 distance for the unit-length OpenAI embeddings.
+    """
+    n = index.ntotal
+    k = min(k, max(n - 1, 0))
+    ids = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float16)
+    if k == 0:
+        return ids, scores
+
+    for start in tqdm(range(0, n, chunk_rows), desc="Similar items"):
+        rows = np.arange(start, min(start + chunk_rows, n))
+        D, I = index.search(candidate_vectors(index, rows), k + 1)
+        # Drop each row's own id (usually, but not always, in first place)
+        keep = (I != rows[:, None]) & (I >= 0)
+        order = np.argsort(~keep, axis=1, kind="stable")[:, :k]   # kept columns first, rank order intact
+        valid = np.take_along_axis(keep, order, axis=1)
+        ids[rows] = np.where(valid, np.take_along_axis(I, order, axis=1), -1)
+        scores[rows] = np.where(valid, 1.0 - np.take_along_axis(D, order, axis=1) / 2.0, 0.0)
+    return ids, scores
+
+
+def save_similar(ids: np.ndarray, scores: np.ndarray, version: str, path: str = SIMILAR_FILE):
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, ids=ids, scores=scores, version=np.array(version))
+    os.replace(path + ".tmp", path)
+
+
+def load_similar(path: str = SIMILAR_FILE, version: str = None):
+    """Return {"ids", "scores"} or None when missing or built for another index version."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        if version is not None and str(data["version"]) != version:
+            print(f"⚠️ {path} is stale; rebuild with python similar_items.py")
+            return None
+        return {"ids": data["ids"], "scores": data["scores"]}
+
+
+def similar_to(graph, product_id: int, n: int = 3):
+    """Up to ``n`` (neighbour id, score) pairs for one product, straight from the graph row."""
+    if graph is None or product_id >= len(graph["ids"]):
+        return []
+    row = graph["ids"][product_id][:n]
+    return [(int(i), float(s)) for i, s in zip(row, graph["scores"][product_id][:n]) if i >= 0]
+
+
+def build_and_save(index_file: str = None, metadata_file: str = None, out_file: str = SIMILAR_FILE,
+                   k: int = SIMILAR_K, index=None, version: str = None):
+    """Build the graph for the live release (or the given files) and save it.
+
+    Pass ``index`` and its ``version`` when the caller has just published them.
+    """
+    start = time.perf_counter()
+    if index is None or version is None:
+        version, index_file, metadata_file = resolve_files(index_file, metadata_file)
+    if index is None:
+        import faiss  # the app imports this module only for load_similar / similar_to
+        index = faiss.read_index(index_file)
+    ids, scores = build_similar(index, k)
+    save_similar(ids, scores, version, out_file)
+    print(f"✅ Similar-items graph ({ids.shape[0]}×{ids.shape[1]}) saved to {out_file} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the item-to-item similar products graph")
+    parser.add_argument("--index", help="Index file (default: the live release)")
+    parser.add_argument("--metadata", help="Metadata file (default: the live release)")
+    parser.add_argument("--output", default=SIMILAR_FILE)
+    parser.add_argument("-k", type=int, default=SIMILAR_K)
+    args = parser.parse_args()
+    if bool(args.index) != bool(args.metadata):
+        parser.error("--index and --metadata must be given together (or neither, for the live release)")
+    build_and_save(args.index, args.metadata, args.output, args.k)
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import argparse
+
+import faiss
+import numpy as np
+from tqdm import tqdm
+
+from attributes import ATTRIBUTES_FILE, save_attributes
+from benchmark import peak_rss_mb
+from faiss_index import FAISS_INDEX_FILE, METADATA_FILE, index_version
+from precompute import PRECOMPUTED_FILE, PROMPT_EMBEDDINGS_FILE
+from prompt_feeder import get_prompts_by_category
+from query_router import normalize_query
+
+# ──────────────────────────────────────────────
+# ⚙️ Generator defaults
+# ──────────────────────────────────────────────
+DEFAULT_DIM = 1536        # text-embedding-3-small
+CHUNK_SIZE = 50_000       # rows generated, indexed and written per step
+SHARD_ROWS = 1_000_000    # rows per output directory; one shard's IndexFlatL2 is n × dim × 4 bytes in RAM
+PROMPT_SPREAD = 1.5       # how far prompt clusters sit from their category centre
+PRODUCT_NOISE = 1.2       # how far products sit from their prompt cluster
+
+BRANDS = ["Acme", "Nova", "Zenith", "Orbit", "Vertex", "Lumen", "Pioneer", "Apex", "Kestrel", "Summit"]
+SHOPS = ["shop-alpha.example", "megamart.example", "gadgethub.example", "bestdeals.example",
+         "reviewsite.example", "outlet.example", "marketplace.example", "forum.example"]
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    return x / np.linalg.norm(x, axis=-1, keepdims=True)
+
+
+def make_centroids(prompt_map: dict, dim: int, rng: np.random.Generator):
+    """One centre per category, and one cluster per prompt scattered around its category."""
+    prompts, categories = [], []
+    for category, items in prompt_map.items():
+        for prompt in dict.fromkeys(items):
+            prompts.append(prompt)
+            categories.append(category)
+    category_names = list(prompt_map)
+    category_centres = _unit(rng.standard_normal((len(category_names), dim), dtype=np.float32))
+    category_of_prompt = np.array([category_names.index(c) for c in categories])
+    prompt_centres = _unit(
+        category_centres[category_of_prompt]
+        + PROMPT_SPREAD * _unit(rng.standard_normal((len(prompts), dim), dtype=np.float32))
+    )
+    return prompts, categories, prompt_centres
+
+
+def make_metadata(ids: np.ndarray, prompt_rows: np.ndarray, prompts, categories,
+                  prices: np.ndarray, ratings: np.ndarray, rng: np.random.Generator):
+    """Product records shaped like the crawler's, one per generated vector."""
+    brands = rng.integers(0, len(BRANDS), len(ids))
+    shops = rng.integers(0, len(SHOPS), len(ids))
+    records = []
+    for i, p, b, s, price, rating in zip(ids, prompt_rows, brands, shops, prices, ratings):
+        prompt = prompts[p]
+        shop = SHOPS[s]
+        records.append({
+            "title": f"{BRANDS[b]} {prompt} — model {i:07d}",
+            "summary": f"{BRANDS[b]}'s pick for {prompt}. Reviewed and compared by {shop}.",
+            "url": f"https://{shop}/p/{i}",
+            "price": f"${price:,.2f}" if np.isfinite(price) else "",
+            "rating": f"{rating:.1f}" if np.isfinite(rating) else "",
+            "category": categories[p],
+            "source": shop,
+        })
+    return records
+
+
+def index_bytes(n: int, dim: int) -> int:
+    """RAM an IndexFlatL2 of ``n`` vectors needs, to write it and again to search it."""
+    return n * dim * 4
+
+
+def generate_shard(out_dir: str, first_id: int, n: int, prompts, categories, centres,
+                   rng: np.random.Generator, chunk_size: int = CHUNK_SIZE):
+    """Write one complete index directory (index, metadata, attributes, query embeddings) of ``n`` products.
+
+    Rows are produced chunk by chunk and the metadata JSON is streamed, so memory is the
+    shard's FAISS index plus one chunk.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    dim = centres.shape[1]
+    index = faiss.IndexFlatL2(dim)
+    prices = np.empty(n, dtype="float32")
+    ratings = np.empty(n, dtype="float32")
+
+    metadata_path = os.path.join(out_dir, METADATA_FILE)
+    with open(metadata_path, "w", encoding="utf-8") as meta_file:
+        meta_file.write("[\n")
+        for offset in tqdm(range(0, n, chunk_size), desc=f"Generating {os.path.basename(out_dir)}"):
+            size = min(chunk_size, n - offset)
+            ids = np.arange(first_id + offset, first_id + offset + size)
+            prompt_rows = rng.integers(0, len(prompts), size)
+
+            vectors = _unit(centres[prompt_rows]
+                            + PRODUCT_NOISE * _unit(rng.standard_normal((size, dim), dtype=np.float32)))
+            index.add(vectors.astype("float32"))
+
+            # Log-normal prices around $150, ~30% missing; ratings skewed high, ~60% missing
+            chunk_prices = np.round(rng.lognormal(5.0, 1.0, size), 2).astype("float32")
+            chunk_prices[rng.random(size) < 0.3] = np.nan
+            chunk_ratings = np.round(np.clip(rng.normal(4.2, 0.5, size), 1.0, 5.0), 1).astype("float32")
+            chunk_ratings[rng.random(size) < 0.6] = np.nan
+            prices[offset:offset + size] = chunk_prices
+            ratings[offset:offset + size] = chunk_ratings
+
+            records = make_metadata(ids, prompt_rows, prompts, categories, chunk_prices, chunk_ratings, rng)
+            body = ",\n".join(json.dumps(r, ensure_ascii=False) for r in records)
+            meta_file.write(("" if offset == 0 else ",\n") + body)
+        meta_file.write("\n]\n")
+
+    index_path = os.path.join(out_dir, FAISS_INDEX_FILE)
+    faiss.write_index(index, index_path)
+    del index
+    save_attributes({"price": prices, "rating": ratings}, os.path.join(out_dir, ATTRIBUTES_FILE))
+
+    # Prompt centres double as cached query embeddings for `benchmark.py --queries cached`
+    keys = list(dict.fromkeys(normalize_query(p) for p in prompts))
+    rows = {normalize_query(p): i for i, p in reversed(list(enumerate(prompts)))}
+    np.save(os.path.join(out_dir, PROMPT_EMBEDDINGS_FILE), centres[[rows[k] for k in keys]])
+    with open(os.path.join(out_dir, PRECOMPUTED_FILE), "w", encoding="utf-8") as f:
+        json.dump({"index_version": index_version(index_path, metadata_path),
+                   "embedding_keys": keys, "entries": {}}, f)
+    return index_path, metadata_path
+
+
+def generate(n: int, out_dir: str, dim: int = DEFAULT_DIM, seed: int = 0, chunk_size: int = CHUNK_SIZE,
+             shard_rows: int = SHARD_ROWS):
+    """Write ``n`` synthetic products as one index directory, or as ``shard-NNN/`` directories past ``shard_rows``.
+
+    Each shard is a self-contained directory that app.py, benchmark.py and precompute.py
+    load on their own; none of them holds more than one shard (index + metadata) in
+    memory. One directory can only be as large as RAM allows: its whole flat index is
+    held while writing and again by whatever searches it, and its metadata is read with
+    a single json.load. At 1536 dims a 1M-row shard is ~6.1 GB of vectors, so 10M
+    products (~61 GB) are only usable as shards; lower ``shard_rows`` or ``dim`` for
+    smaller boxes.
+    """
+    rng = np.random.default_rng(seed)
+    prompts, categories, centres = make_centroids(get_prompts_by_category(), dim, rng)
+    shards = max(1, -(-n // shard_rows))
+    print(f"🧮 {n:,} products × {dim} dims: {index_bytes(n, dim) / 1e9:.1f} GB of vectors in {shards} shard(s), "
+          f"peak ~{index_bytes(min(n, shard_rows), dim) / 1e9:.1f} GB for the largest")
+    start = time.perf_counter()
+
+    written = []
+    for shard in range(shards):
+        first = shard * shard_rows
+        size = min(shard_rows, n - first)
+        shard_dir = out_dir if shards == 1 else os.path.join(out_dir, f"shard-{shard:03d}")
+        written.append(generate_shard(shard_dir, first, size, prompts, categories, centres, rng, chunk_size))
+
+    elapsed = time.perf_counter() - start
+    index_total = sum(os.path.getsize(i) for i, _ in written)
+    metadata_total = sum(os.path.getsize(m) for _, m in written)
+    print(f"✅ {n:,} products × {dim} dims written to {out_dir} in {elapsed:.1f}s "
+          f"(index {index_total / 1e9:.2f} GB, metadata {metadata_total / 1e9:.2f} GB, "
+          f"peak RSS {peak_rss_mb():,.0f} MB)")
+    first_dir = os.path.dirname(written[0][0]) or "."
+    print(f"📏 Benchmark with: cd {first_dir} && python {os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark.py')} --queries cached"
+          + (" (one shard at a time)" if shards > 1 else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic product catalog for scale testing")
+    parser.add_argument("-n", type=int, default=100_000,
+                        help="Number of products; past --shard-rows they are split into shard directories")
+    parser.add_argument("--out", default="synthetic_catalog")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM,
+                        help="Embedding dimension; lower it to fit bigger shards in RAM")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--shard-rows", type=int, default=SHARD_ROWS,
+                        help="Products per shard directory (each needs shard-rows × dim × 4 bytes of RAM)")
+    args = parser.parse_args()
+    generate(args.n, args.out, args.dim, args.seed, args.chunk_size, args.shard_rows)
@@ -0,0 +1,212 @@
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+# ──────────────────────────────────────────────
+# ⚙️ Telemetry settings
+# ──────────────────────────────────────────────
+METRIC_PREFIX = "shoplyst"
+# Histogram bucket upper bounds in seconds (Prometheus default-ish, stretched for LLM calls)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)   # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class Registry:
+    """Process-wide span histograms and cache counters, safe to update from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans: Dict[str, _Histogram] = {}
+        self.cache: Dict[Tuple[str, str], int] = {}
+        self.counters: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]] = {}
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            self.spans.setdefault(name, _Histogram()).observe(seconds)
+
+    def count_cache(self, cache: str, result: str, n: int = 1):
+        with self._lock:
+            self.cache[(cache, result)] = self.cache.get((cache, result), 0) + n
+
+    def count(self, name: str, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def counter_values(self, name: str) -> Dict[Tuple[Tuple[str, str], ...], float]:
+        with self._lock:
+            return dict(self.counters.get(name, {}))
+
+    def span_stats(self, name: str) -> Optional[dict]:
+        """count / mean / approximate p50 and p95 (bucket upper bounds) for one span."""
+        with self._lock:
+            h = self.spans.get(name)
+            if h is None or not h.count:
+                return None
+            counts, total, count = list(h.counts), h.total, h.count
+        bounds = BUCKETS + (float("inf"),)
+
+        def quantile(q):
+            cumulative = 0
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                if cumulative >= q * count:
+                    return bound
+            return bounds[-1]
+
+        return {"count": count, "mean": total / count, "p50": quantile(0.5), "p95": quantile(0.95)}
+
+    def hit_ratios(self) -> Dict[str, dict]:
+        """{cache: {"hits", "misses", "ratio"}}; lookups that were not misses count as hits."""
+        with self._lock:
+            names = {cache for cache, _ in self.cache}
+            out = {}
+            for cache in sorted(names):
+                lookups = self.cache.get((cache, "lookup"), 0)
+                misses = self.cache.get((cache, "miss"), 0)
+                hits = max(0, lookups - misses)
+                out[cache] = {"hits": hits, "misses": misses, "ratio": hits / lookups if lookups else None}
+            return out
+
+    def summary(self) -> List[dict]:
+        """Per-span count / mean / total, slowest total first (for the debug panel)."""
+        with self._lock:
+            rows = [{"span": name, "count": h.count, "mean_ms": 1000 * h.total / h.count, "total_s": h.total}
+                    for name, h in self.spans.items() if h.count]
+        return sorted(rows, key=lambda r: -r["total_s"])
+
+    def prometheus_text(self) -> str:
+        """Prometheus text exposition (also scrapeable by the OpenTelemetry Collector)."""
+        span_metric = f"{METRIC_PREFIX}_span_duration_seconds"
+        cache_metric = f"{METRIC_PREFIX}_cache_requests_total"
+        lines = [f"# HELP {span_metric} Wall time of instrumented stages.",
+                 f"# TYPE {span_metric} histogram"]
+        with self._lock:
+            for name, h in sorted(self.spans.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS + (float("inf"),), h.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{span_metric}_bucket{{span="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'{span_metric}_sum{{span="{name}"}} {h.total:.6f}')
+                lines.append(f'{span_metric}_count{{span="{name}"}} {h.count}')
+            lines += [f"# HELP {cache_metric} Cache lookups and misses per cache.",
+                      f"# TYPE {cache_metric} counter"]
+            for (cache, result), n in sorted(self.cache.items()):
+                lines.append(f'{cache_metric}{{cache="{cache}",result="{result}"}} {n}')
+            for name, series in sorted(self.counters.items()):
+                metric = f"{METRIC_PREFIX}_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                for key, value in sorted(series.items()):
+                    labels = ",".join(f'{k}="{v}"' for k, v in key)
+                    # Full precision: "{:g}" would export 2345678 bytes as 2.34568e+06
+                    text = str(int(value)) if float(value).is_integer() else repr(float(value))
+                    lines.append(f"{metric}{{{labels}}} {text}" if labels else f"{metric} {text}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Cold-start clock: the app imports this module first, once per process
+PROCESS_START = time.perf_counter()
+_milestones: Dict[str, float] = {}
+
+# Spans of the request currently being handled in this thread/context (see trace())
+_current_trace: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("trace", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """Time a block into the ``name`` histogram and the active request trace, if any."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        REGISTRY.observe(name, seconds)
+        spans = _current_trace.get()
+        if spans is not None:
+            spans.append((name, seconds * 1000))
+
+
+@contextmanager
+def trace():
+    """Collect every span finished inside the block as a list of (name, ms)."""
+    spans = []
+    token = _current_trace.set(spans)
+    try:
+        yield spans
+    finally:
+        _current_trace.reset(token)
+
+
+def record(name: str, seconds: float):
+    """Add an externally measured duration (e.g. a pipeline stage's busy time)."""
+    REGISTRY.observe(name, seconds)
+
+
+def count(name: str, value: float = 1, **labels):
+    """Bump a labelled counter, e.g. count("crawl_pages_total", domain="x.com", outcome="ok")."""
+    REGISTRY.count(name, value, **labels)
+
+
+def milestone(name: str) -> Optional[float]:
+    """Record seconds since PROCESS_START the first time ``name`` is reached (None afterwards)."""
+    if name in _milestones:
+        return None
+    seconds = _milestones.setdefault(name, time.perf_counter() - PROCESS_START)
+    REGISTRY.observe(name, seconds)
+    print(f"🚀 {name}: {seconds:.2f}s after start")
+    return seconds
+
+
+def milestones() -> Dict[str, float]:
+    return dict(_milestones)
+
+
+def cache_lookup(cache: str):
+    REGISTRY.count_cache(cache, "lookup")
+
+
+def cache_miss(cache: str):
+    REGISTRY.count_cache(cache, "miss")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_metrics(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Expose /metrics on ``port`` from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    print(f"📈 Metrics on http://{host}:{port}/metrics")
+    return server
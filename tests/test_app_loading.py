@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+pytest.importorskip("streamlit")
+
+import app
+import autocomplete
+import index_release
+
+
+def test_release_loads_without_a_precompute_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)   # no precomputed_results.json / prompt_embeddings.npy here
+    index = faiss.IndexFlatL2(4)
+    index.add(np.eye(4, dtype="float32"))
+    metadata = [{"title": f"Product {i}", "category": "laptops", "price": 100.0 * i} for i in range(4)]
+    release = index_release.publish(index, metadata, releases_dir="releases")
+    version, directory = index_release.locate(releases_dir="releases")
+    assert version == release
+
+    completer = autocomplete.Completer()
+    loaded_index, loaded_metadata, _, router, *_ = app._read_data(version, directory, completer)
+
+    assert loaded_index.ntotal == 4
+    assert loaded_metadata == metadata
+    assert router.vectors == {}
+    assert router.prompt_vector("Product 1") is None
+    assert completer.titles_version == version
@@ -0,0 +1,104 @@
+import random
+
+import numpy as np
+
+import autocomplete
+from autocomplete import Completer
+
+PROMPTS = {"cameras": ["Mirrorless camera with 4K", "Mirrorless camera for beginners"]}
+TITLES = [{"title": "Mirrorless Camera Body Only"}, {"title": "Mini tripod"}]
+
+
+def texts(completions):
+    return [text for text, _ in completions]
+
+
+def test_prompts_rank_above_titles_and_are_marked_known():
+    completer = Completer(PROMPTS)
+    completer.set_titles(TITLES)
+
+    completions = completer.complete("mirr")
+    assert texts(completions)[-1] == "Mirrorless Camera Body Only"
+    assert all(known for _, known in completions[:2])
+    assert not completions[-1][1]
+
+
+def test_history_boosts_ranking_before_and_after_the_merge():
+    completer = Completer(PROMPTS)
+    completer.set_titles(TITLES)
+    for _ in range(2):
+        completer.record("mirrorless camera body only")
+
+    before = completer.complete("mirr")    # still in the pending buffer
+    completer.merge()
+    after = completer.complete("mirr")
+
+    assert texts(before)[0] == texts(after)[0] == "Mirrorless Camera Body Only"
+    assert before == after
+
+
+def test_new_queries_appear_and_the_typed_query_is_excluded():
+    completer = Completer(PROMPTS)
+    completer.record("mini projector")
+    assert texts(completer.complete("mini")) == ["mini projector"]
+    assert completer.complete("mini projector") == []
+
+    completer.merge()
+    assert texts(completer.complete("mini")) == ["mini projector"]
+
+
+def test_new_queries_get_in_once_history_is_full():
+    completer = Completer(max_history=3)
+    for query in ("alpha one", "bravo two", "charlie three"):
+        completer.record(query)
+    completer.merge()
+    completer.record("charlie three")   # seen again: outlives the older entries
+    completer.record("delta four")
+    completer.merge()
+
+    assert texts(completer.complete("delta")) == ["delta four"]
+    assert texts(completer.complete("charlie")) == ["charlie three"]
+    assert len(completer) == 3
+
+
+def test_stale_popular_queries_are_eventually_evicted():
+    completer = Completer(max_history=2)
+    for _ in range(3):
+        completer.record("old favourite")
+    completer.merge()
+    for i in range(12):
+        completer.record(f"fresh query {i}")
+        completer.merge()
+
+    assert completer.complete("old") == []
+
+
+def test_incremental_merges_match_a_full_rebuild():
+    rng = random.Random(0)
+    words = ["camera", "case", "cable", "charger", "drone", "desk", "lamp", "laptop", "mouse", "mic"]
+    completer = Completer(PROMPTS, max_history=40)
+    completer.set_titles([{"title": f"{rng.choice(words)} {rng.choice(words)} {i}"} for i in range(200)])
+    for _ in range(6):
+        for _ in range(30):
+            completer.record(f"{rng.choice(words)} {rng.choice(words)}")
+        completer.merge()
+
+    merged, rebuilt = completer._snapshot, completer._build()
+    assert merged.keys == rebuilt.keys
+    assert merged.display == rebuilt.display
+    assert np.array_equal(merged.weights, rebuilt.weights)
+    assert merged.top.keys() == rebuilt.top.keys()
+    for prefix in rebuilt.top:
+        assert np.array_equal(merged.top[prefix], rebuilt.top[prefix]), prefix
+
+
+def test_record_merges_on_a_background_thread(monkeypatch):
+    monkeypatch.setattr(autocomplete, "MERGE_EVERY", 3)
+    completer = Completer()
+    for query in ("tent", "tent", "torch"):
+        completer.record(query)
+    completer._merge_thread.join(timeout=5)
+
+    assert completer._pending_total == 0
+    assert completer._snapshot.keys == ["tent", "torch"]
+    assert texts(completer.complete("t")) == ["tent", "torch"]
@@ -0,0 +1,28 @@
+import pytest
+
+import crawl_metrics
+import telemetry
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    monkeypatch.setattr(telemetry, "REGISTRY", telemetry.Registry())
+
+
+def test_refused_fetches_count_as_failed_attempts():
+    crawl_metrics.record_page("x.com", "ok", 1000)
+    crawl_metrics.record_page("x.com", "refused")
+    crawl_metrics.record_page("only403.com", "refused")
+
+    stats = crawl_metrics.domain_stats()
+    assert stats["x.com"]["pages"] == 2 and stats["x.com"]["errors"] == 1
+    assert stats["only403.com"]["pages"] == 1 and stats["only403.com"]["error_rate"] == 1.0
+
+
+def test_bot_check_pages_are_not_counted_twice():
+    crawl_metrics.record_page("x.com", "ok", 1000)
+    crawl_metrics.record_page("x.com", "blocked")   # the same page, rejected at parse time
+
+    stats = crawl_metrics.domain_stats()
+    assert stats["x.com"]["pages"] == 1
+    assert stats["x.com"]["error_rate"] == 1.0
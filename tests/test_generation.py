@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+openai = pytest.importorskip("openai")
+
+import generation
+from llm_benchmark import SAMPLE_DOCS, serve_fake_openai
+
+PROMPT = "Recommend one of these."
+QUERY = "quiet laptop"
+
+
+@pytest.fixture
+def fake_openai():
+    """Start a scripted fake server; returns (client, server) and shuts it down afterwards."""
+    servers = []
+
+    def start(script):
+        server = serve_fake_openai(script=script, error_prob=0.0, tail_prob=0.0, median=0.01)
+        servers.append(server)
+        client = openai.OpenAI(api_key="sk-test", base_url=f"http://127.0.0.1:{server.server_port}/v1")
+        return client, server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def short_hedge_delay(monkeypatch):
+    # Hedge after 0.2s instead of the production default, so tests stay fast
+    monkeypatch.setattr(generation, "HEDGE_DELAY", 0.2)
+    monkeypatch.setattr(generation, "HEDGE_MIN_DELAY", 0.1)
+
+
+def test_hedge_wins_when_the_primary_stalls(fake_openai):
+    client, _ = fake_openai([(3.0, False), (0.05, False)])
+    text, info = generation.Generator(client, deadline=2.0).generate(PROMPT, QUERY, SAMPLE_DOCS)
+
+    assert text == "Fake recommendation."
+    assert info["source"] == "hedge"
+    assert info["attempts"] == 2
+    assert info["latency_ms"] < 1500
+
+
+def test_fallback_when_the_deadline_passes(fake_openai):
+    client, _ = fake_openai([(3.0, False), (3.0, False)])
+    start = time.perf_counter()
+    text, info = generation.Generator(client, deadline=0.5).generate(PROMPT, QUERY, SAMPLE_DOCS)
+
+    assert info["source"] == "fallback"
+    assert text == generation.template_answer(QUERY, SAMPLE_DOCS)
+    assert time.perf_counter() - start < 1.5
+
+
+def test_fallback_when_every_attempt_errors(fake_openai):
+    client, _ = fake_openai([(0.0, True), (0.0, True)])
+    text, info = generation.Generator(client, deadline=2.0).generate(PROMPT, QUERY, SAMPLE_DOCS)
+
+    assert info["source"] == "fallback"
+    assert info["attempts"] == 2
+    assert len(info["errors"]) == 2
+    assert text == generation.template_answer(QUERY, SAMPLE_DOCS)
+
+
+def test_no_hedge_while_the_pool_is_saturated(fake_openai):
+    client, _ = fake_openai([(0.6, False)])
+    text, info = generation.Generator(client, deadline=2.0, max_workers=1).generate(PROMPT, QUERY, SAMPLE_DOCS)
+
+    assert info["source"] == "primary"
+    assert info["attempts"] == 1
+    assert info["hedge_skipped"]
+
+
+def test_attempts_that_queued_past_the_deadline_are_not_sent(fake_openai):
+    client, server = fake_openai([(1.0, False)])
+    generator = generation.Generator(client, deadline=0.3, hedge=False, max_workers=1)
+    blocker = generator._executor.submit(time.sleep, 0.5)   # keeps the only worker busy
+
+    _, info = generator.generate(PROMPT, QUERY, SAMPLE_DOCS)
+    blocker.result()
+    time.sleep(0.1)
+
+    assert info["source"] == "fallback"
+    assert server.script == [(1.0, False)]   # the queued attempt never reached the server
@@ -0,0 +1,31 @@
+import scrape_store
+from scrape_store import SegmentStore
+
+
+def test_compaction_keeps_the_latest_record_per_url(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    store.append("lamps", [{"url": "a", "price": 1}, {"url": "b", "price": 2}])
+    store.append("lamps", [{"url": "a", "price": 3}])
+
+    assert store.compact() == {"lamps": (3, 2)}
+    assert sorted((r["url"], r["price"]) for r in store.iter_records()) == [("a", 3), ("b", 2)]
+
+
+def test_reads_started_before_a_compaction_can_finish(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrape_store, "SEGMENT_MAX_BYTES", 1)   # one sealed segment per append
+    store = SegmentStore(str(tmp_path))
+    for i in range(3):
+        store.append("lamps", [{"url": f"lamp-{i}"}])
+    old_paths = [s["path"] for s in store.load_manifest()["segments"]]
+
+    reader = store.iter_records()
+    first = next(reader)                 # the reader now holds the pre-compaction manifest
+    store.compact()
+    rest = list(reader)
+
+    assert [r["url"] for r in [first] + rest] == ["lamp-0", "lamp-1", "lamp-2"]
+    assert store.load_manifest()["retired"] == old_paths
+
+    store.compact()                      # the next compaction deletes them
+    assert not any((tmp_path / path).exists() for path in old_paths)
+    assert sorted(r["url"] for r in store.iter_records()) == ["lamp-0", "lamp-1", "lamp-2"]